@@ -1,9 +1,9 @@
-import boto3
+from baram.client_manager import ClientManager
 
 
 class AirflowManager:
     def __init__(self):
-        self.cli = boto3.client('mwaa')
+        self.cli = ClientManager.get_client('mwaa')
 
     def get_environment(self, name: str):
         '''
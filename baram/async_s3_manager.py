@@ -0,0 +1,390 @@
+import asyncio
+import os
+from contextlib import AsyncExitStack
+from typing import Optional
+
+import botocore
+import ujson
+from aiobotocore.config import AioConfig
+from aiobotocore.session import get_session
+
+from baram.log_manager import LogManager
+
+
+class AsyncS3Manager:
+    '''
+    asyncio-native S3Manager on aiobotocore.
+    One client, and so one connection pool, is shared by every coroutine using the manager,
+    and one semaphore keeps at most max_concurrency requests, with their part buffers, in flight across all operations.
+
+    ex)
+        async with AsyncS3Manager('sli-dst-dlbeta-public') as sm:
+            bodies = await asyncio.gather(*[sm.get_object(k) async for k in sm.iter_keys('crawl_data/')])
+    '''
+
+    def __init__(self, bucket_name: str, region: Optional[str] = 'ap-northeast-2', max_concurrency: int = 100):
+        '''
+
+        :param bucket_name: s3 bucket name
+        :param region: aws region
+        :param max_concurrency: the max number of requests in flight, also used as connection pool size.
+        '''
+        self.bucket_name = bucket_name
+        self.max_concurrency = max_concurrency
+        self.config = AioConfig(region_name=region,
+                                signature_version='v4',
+                                max_pool_connections=max_concurrency,
+                                retries={'max_attempts': 10, 'mode': 'standard'})
+        self.logger = LogManager.get_logger('AsyncS3Manager')
+        self.cli = None
+        self._exit_stack = None
+        self._semaphore = None
+        self._sse_lock = None
+        self._sse_extra_args = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def open(self):
+        '''
+        Create the shared client. `async with` calls this.
+
+        :return:
+        '''
+        if self.cli is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._sse_lock = asyncio.Lock()
+            self._exit_stack = AsyncExitStack()
+            self.cli = await self._exit_stack.enter_async_context(
+                get_session().create_client('s3', config=self.config))
+
+    async def close(self):
+        '''
+        Close the shared client and its connections.
+
+        :return:
+        '''
+        if self._exit_stack:
+            await self._exit_stack.aclose()
+        self.cli, self._exit_stack = None, None
+
+    async def _get_sse_extra_args(self) -> dict:
+        '''
+        Get server side encryption args of the bucket, resolved once per manager.
+        Concurrent callers wait for the first one's request instead of sending their own.
+
+        :return: extra args, empty when the bucket has no KMS key.
+        '''
+        async with self._sse_lock:
+            if self._sse_extra_args is None:
+                try:
+                    response = await self._request('get_bucket_encryption', Bucket=self.bucket_name)
+                    bi = response['ServerSideEncryptionConfiguration']['Rules'][0]['ApplyServerSideEncryptionByDefault']
+                    self._sse_extra_args = {'ServerSideEncryption': bi['SSEAlgorithm'],
+                                            'SSEKMSKeyId': bi['KMSMasterKeyID']}
+                except (botocore.exceptions.ClientError, KeyError, IndexError, TypeError):
+                    self._sse_extra_args = {}
+            return self._sse_extra_args
+
+    async def _request(self, method: str, **kwargs):
+        '''
+        Call a client method while holding one of the max_concurrency request slots.
+
+        :param method: client method name. ex) head_object
+        :param kwargs: arguments of the method
+        :return: response
+        '''
+        async with self._semaphore:
+            return await getattr(self.cli, method)(**kwargs)
+
+    async def put_object(self, s3_key_id: str, body):
+        '''
+
+        :param s3_key_id: s3 key id. ex) nylon-detector/a.csv
+        :param body: byte or str data
+        :return: response
+        '''
+        extra_args = await self._get_sse_extra_args()
+        return await self._request('put_object', Bucket=self.bucket_name, Key=s3_key_id, Body=body, **extra_args)
+
+    async def get_object(self, s3_key_id: str):
+        '''
+
+        :param s3_key_id: s3 key id. ex) nylon-detector/a.csv
+        :return: bytes or None
+        '''
+        try:
+            async with self._semaphore:
+                response = await self.cli.get_object(Bucket=self.bucket_name, Key=s3_key_id)
+                async with response['Body'] as stream:
+                    return await stream.read()
+        except self.cli.exceptions.NoSuchKey:
+            self.logger.info(f'{s3_key_id} does not exist.')
+            return None
+
+    async def get_object_as_json(self, s3_key_id: str) -> Optional[dict]:
+        '''
+        Get S3 object and parse as JSON.
+
+        :param s3_key_id: s3 key id. ex) nylon-detector/a.json
+        :return: parsed dict or None
+        '''
+        body = await self.get_object(s3_key_id)
+        return ujson.loads(body) if body else None
+
+    async def put_object_as_json(self, s3_key_id: str, data: dict):
+        '''
+        Serialize dict to JSON and put to S3.
+
+        :param s3_key_id: s3 key id. ex) nylon-detector/a.json
+        :param data: dict data
+        :return: response
+        '''
+        return await self.put_object(s3_key_id, ujson.dumps(data))
+
+    async def head_object(self, s3_key_id: str) -> Optional[dict]:
+        '''
+        Head s3 object.
+
+        :param s3_key_id: s3 key id
+        :return: response or None
+        '''
+        try:
+            return await self._request('head_object', Bucket=self.bucket_name, Key=s3_key_id)
+        except botocore.exceptions.ClientError:
+            return None
+
+    async def delete_object(self, s3_key_id: str):
+        '''
+
+        :param s3_key_id: s3 key id. ex) nylon-detector/a.csv
+        :return: response
+        '''
+        return await self._request('delete_object', Bucket=self.bucket_name, Key=s3_key_id)
+
+    async def delete_objects(self, s3_keys: list, quiet: bool = True):
+        '''
+
+        :param s3_keys: up to 1000 s3 keys
+        :param quiet: return only errors
+        :return: response
+        '''
+        return await self._request('delete_objects', Bucket=self.bucket_name,
+                                   Delete={'Objects': [{'Key': k} for k in s3_keys], 'Quiet': quiet})
+
+    async def iter_objects(self, prefix: str = '', delimiter: str = '', pages: bool = False,
+                           start_after: Optional[str] = None):
+        '''
+        Iterate S3 objects lazily, one list_objects_v2 page at a time.
+
+        :param prefix: Limits the response to keys that begin with the specified prefix.
+        :param delimiter: A delimiter is a character you use to group keys.
+        :param pages: yield each page as a list of objects instead of each object.
+        :param start_after: start listing after this key.
+        :return: async generator of objects or pages
+        '''
+        kwargs = {'Bucket': self.bucket_name, 'Prefix': prefix, 'Delimiter': delimiter}
+        if start_after:
+            kwargs['StartAfter'] = start_after
+
+        while True:
+            response = await self._request('list_objects_v2', **kwargs)
+            if 'Contents' in response:
+                if pages:
+                    yield response['Contents']
+                else:
+                    for obj in response['Contents']:
+                        yield obj
+            if 'NextContinuationToken' in response:
+                kwargs['ContinuationToken'] = response['NextContinuationToken']
+            else:
+                break
+
+    async def iter_keys(self, prefix: str = '', delimiter: str = '', pages: bool = False,
+                        start_after: Optional[str] = None):
+        '''
+        Iterate S3 object keys lazily.
+
+        :param prefix: Limits the response to keys that begin with the specified prefix.
+        :param delimiter: A delimiter is a character you use to group keys.
+        :param pages: yield each page as a list of keys instead of each key.
+        :param start_after: start listing after this key.
+        :return: async generator of keys or pages of keys
+        '''
+        async for page in self.iter_objects(prefix=prefix, delimiter=delimiter, pages=True, start_after=start_after):
+            keys = [obj['Key'] for obj in page]
+            if pages:
+                yield keys
+            else:
+                for key in keys:
+                    yield key
+
+    async def list_objects(self, prefix: str = '', delimiter: str = ''):
+        '''
+        List S3 objects.
+
+        :param prefix: Limits the response to keys that begin with the specified prefix.
+        :param delimiter: A delimiter is a character you use to group keys.
+        :return: list of objects or None
+        '''
+        objects = [obj async for obj in self.iter_objects(prefix=prefix, delimiter=delimiter)]
+        return objects if objects else None
+
+    async def list_object_keys(self, prefix: str = '', delimiter: str = '') -> Optional[list]:
+        '''
+        List S3 object keys as strings.
+
+        :param prefix: Limits the response to keys that begin with the specified prefix.
+        :param delimiter: A delimiter is a character you use to group keys.
+        :return: list of key strings or None
+        '''
+        keys = [key async for key in self.iter_keys(prefix=prefix, delimiter=delimiter)]
+        return keys if keys else None
+
+    async def copy(self, from_key: str, to_key: str, to_bucket: Optional[str] = None, **kwargs):
+        '''
+        Creates a copy of an object that is already stored in Amazon S3, up to 5GB.
+
+        :param from_key: origin s3 key
+        :param to_key: destination s3 key
+        :param to_bucket: destination s3 bucket
+        :param kwargs: extra args of copy_object. ex) StorageClass='STANDARD_IA'
+        :return: response
+        '''
+        to_bucket = to_bucket or self.bucket_name
+        extra_args = dict(await self._get_sse_extra_args() if to_bucket == self.bucket_name else {}, **kwargs)
+        return await self._request('copy_object',
+                                   Bucket=to_bucket,
+                                   Key=to_key,
+                                   CopySource={'Bucket': self.bucket_name, 'Key': from_key},
+                                   **extra_args)
+
+    async def upload_file(self, local_file_path: str, s3_file_path: str, part_size: int = 16 * 1024 * 1024):
+        '''
+        Upload file. Files larger than part_size are uploaded as concurrent multipart parts.
+        A part is read from disk in a thread only once it holds a request slot.
+
+        :param local_file_path: local file path. ex) /Users/lks21c/repo/sli-aflow/a.csv
+        :param s3_file_path: s3 path. ex) nylon-detector/crawl_data/a.csv
+        :param part_size: bytes per part, at least 5MB.
+        :return: response
+        '''
+
+        def read(offset: int) -> bytes:
+            with open(local_file_path, 'rb') as f:
+                f.seek(offset)
+                return f.read(part_size)
+
+        size = os.path.getsize(local_file_path)
+        extra_args = await self._get_sse_extra_args()
+        if size <= part_size:
+            async with self._semaphore:
+                body = await asyncio.to_thread(read, 0)
+                return await self.cli.put_object(Bucket=self.bucket_name, Key=s3_file_path, Body=body, **extra_args)
+
+        upload = await self._request('create_multipart_upload', Bucket=self.bucket_name, Key=s3_file_path,
+                                     **extra_args)
+
+        async def upload_part(part_number: int):
+            async with self._semaphore:
+                body = await asyncio.to_thread(read, (part_number - 1) * part_size)
+                response = await self.cli.upload_part(Bucket=self.bucket_name, Key=s3_file_path,
+                                                      UploadId=upload['UploadId'], PartNumber=part_number, Body=body)
+            return {'PartNumber': part_number, 'ETag': response['ETag']}
+
+        try:
+            parts = await asyncio.gather(*[upload_part(i + 1) for i in range((size + part_size - 1) // part_size)])
+            return await self._request('complete_multipart_upload', Bucket=self.bucket_name, Key=s3_file_path,
+                                       UploadId=upload['UploadId'], MultipartUpload={'Parts': parts})
+        except Exception as e:
+            await self._request('abort_multipart_upload', Bucket=self.bucket_name, Key=s3_file_path,
+                                UploadId=upload['UploadId'])
+            raise e
+
+    async def download_file(self, s3_file_path: str, local_file_path: str):
+        '''
+        Download file from s3, streaming the body to disk. Chunks are written in a thread.
+
+        :param s3_file_path: s3 path. ex) nylon-detector/crawl_data/a.csv
+        :param local_file_path: local file path. ex) /Users/lks21c/repo/sli-aflow/a.csv
+        :return:
+        '''
+        async with self._semaphore:
+            response = await self.cli.get_object(Bucket=self.bucket_name, Key=s3_file_path)
+            body = response['Body']
+            try:
+                with open(local_file_path, 'wb') as f:
+                    async for chunk in body.iter_chunks(1024 * 1024):
+                        await asyncio.to_thread(f.write, chunk)
+            finally:
+                body.close()
+
+    async def upload_dir(self, local_dir_path: str, s3_dir_path: str):
+        '''
+        Upload directory concurrently.
+
+        :param local_dir_path: local dir path. ex) /Users/lks21c/repo/sli-aflow
+        :param s3_dir_path: s3 path. ex) nylon-detector/crawl_data
+        :return: the number of uploaded files
+        '''
+        targets = []
+        for path, subdirs, files in os.walk(local_dir_path):
+            for file in files:
+                dest_path = path.replace(local_dir_path, '')
+                targets.append((os.path.join(path, file),
+                                os.path.normpath(s3_dir_path + '/' + dest_path + '/' + file)))
+        await asyncio.gather(*[self.upload_file(local, s3) for local, s3 in targets])
+        self.logger.info(f'upload {len(targets)} files to s3://{self.bucket_name}/{s3_dir_path}')
+        return len(targets)
+
+    async def download_dir(self, s3_dir_path: str, local_dir_path: str = os.getcwd()):
+        '''
+        Download directory from s3 concurrently.
+
+        :param s3_dir_path: s3 path. ex) nylon-detector/crawl_data
+        :param local_dir_path: local dir path. ex) /Users/lks21c/repo/sli-aflow
+        :return: the number of downloaded files
+        '''
+        targets = []
+        async for key in self.iter_keys(s3_dir_path):
+            if key.endswith('/'):
+                continue
+            local_obj_path = os.path.join(local_dir_path, key)
+            os.makedirs(os.path.dirname(local_obj_path), exist_ok=True)
+            targets.append((key, local_obj_path))
+        await asyncio.gather(*[self.download_file(key, local) for key, local in targets])
+        self.logger.info(f'download {len(targets)} files to {local_dir_path}')
+        return len(targets)
+
+    async def delete_dir(self, s3_dir_path: str) -> int:
+        '''
+        Delete s3 directory, deleting each listed page while the next one is listed.
+        A page waits for a request slot before the next one is listed, so pages do not pile up.
+
+        :param s3_dir_path: s3 path. ex) nylon-detector/crawl_data
+        :return: the number of deleted keys
+        '''
+        tasks = []
+
+        async def delete(s3_keys: list) -> int:
+            try:
+                response = await self.cli.delete_objects(Bucket=self.bucket_name,
+                                                         Delete={'Objects': [{'Key': k} for k in s3_keys],
+                                                                 'Quiet': True})
+                for error in response.get('Errors', []):
+                    self.logger.error(f'{error["Key"]} error {error.get("Code")}')
+                return len(s3_keys) - len(response.get('Errors', []))
+            finally:
+                self._semaphore.release()
+
+        async for s3_keys in self.iter_keys(s3_dir_path, pages=True):
+            await self._semaphore.acquire()
+            tasks.append(asyncio.ensure_future(delete(s3_keys)))
+        deleted = sum(await asyncio.gather(*tasks))
+        if deleted:
+            self.logger.info(f'delete {s3_dir_path}: {deleted} deleted.')
+        return deleted
@@ -1,13 +1,14 @@
 from datetime import datetime
+from functools import cached_property
 from typing import Optional, Union, Dict, Any, List, Literal
 
 import awswrangler as wr
-import boto3
 import fire
 import pandas as pd
 from awswrangler.athena._utils import _QUERY_WAIT_POLLING_DELAY
 from dateutil.relativedelta import relativedelta
 
+from baram.client_manager import ClientManager
 from baram.s3_manager import S3Manager
 from baram.log_manager import LogManager
 from baram.glue_manager import GlueManager
@@ -22,7 +23,23 @@ class AthenaManager:
         self.QUERY_RESULT_BUCKET = query_result_bucket_name
         self.OUTPUT_BUCKET = output_bucket_name
         self.ATHENA_WORKGROUP = workgroup
-        self.cli = boto3.client('athena')
+        self.cli = ClientManager.get_client('athena')
+        self._s3_managers = {}
+
+    def _get_s3_manager(self, bucket_name: str) -> S3Manager:
+        '''
+        Get S3Manager of the bucket, reusing it across calls.
+
+        :param bucket_name: bucket name
+        :return: S3Manager
+        '''
+        if bucket_name not in self._s3_managers:
+            self._s3_managers[bucket_name] = S3Manager(bucket_name)
+        return self._s3_managers[bucket_name]
+
+    @cached_property
+    def gm(self) -> GlueManager:
+        return GlueManager(self.OUTPUT_BUCKET)
 
     def create_external_table(self,
                               db_name: str,
@@ -80,8 +97,8 @@ class AthenaManager:
         :param table_name: target glue table name
         :return:
         '''
-        sm = S3Manager(self.OUTPUT_BUCKET)
-        gm = GlueManager(self.OUTPUT_BUCKET)
+        sm = self._get_s3_manager(self.OUTPUT_BUCKET)
+        gm = self.gm
 
         try:
             table = gm.get_table(db_name=db_name, table_name=table_name)
@@ -130,7 +147,7 @@ class AthenaManager:
 
         arr = str(res['ResultConfiguration']['OutputLocation']).replace('s3://', '').split('/')
 
-        sm = S3Manager(self.QUERY_RESULT_BUCKET)
+        sm = self._get_s3_manager(self.QUERY_RESULT_BUCKET)
         self.logger.info(f"fetch_result_path={sm.get_s3_web_url(arr[0], '/'.join(arr[1:]))}")
         return res
 
@@ -203,7 +220,7 @@ class AthenaManager:
         :param replacements: specified replacements for specific purpose of query
         :return: string, a line of query
         '''
-        sm = S3Manager(bucket_name=bucket_name)
+        sm = self._get_s3_manager(bucket_name)
         query_txt = sm.get_object(sql_filepath).decode('utf-8').replace('\n', ' ')
         for k, v in replacements.items():
             query_txt = query_txt.replace(k, v)
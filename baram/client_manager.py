@@ -0,0 +1,54 @@
+import threading
+from typing import Optional
+
+import boto3
+from botocore.config import Config
+
+
+class ClientManager:
+    '''
+    Process-wide registry of boto3 clients.
+    boto3 clients are thread-safe, so managers and threads that ask for the same service, region, default session
+    and pool size share one client and its connection pool.
+    Clients refresh rotated credentials themselves, so credentials are not part of the key.
+    '''
+    _clients = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_client(service_name: str,
+                   region: Optional[str] = None,
+                   max_pool_connections: int = 50,
+                   signature_version: Optional[str] = None,
+                   max_attempts: int = 10):
+        '''
+        Get the shared client, creating it on first use.
+
+        :param service_name: aws service name. ex) s3
+        :param region: aws region, defaults to the session region
+        :param max_pool_connections: the max number of pooled connections
+        :param signature_version: signature version. ex) v4
+        :param max_attempts: the max attempts of adaptive retry mode
+        :return: boto3 client
+        '''
+        session = boto3.DEFAULT_SESSION or boto3.Session()
+        key = (service_name, region or session.region_name, boto3.DEFAULT_SESSION,
+               max_pool_connections, signature_version, max_attempts)
+        with ClientManager._lock:
+            if key not in ClientManager._clients:
+                config = Config(region_name=region,
+                                signature_version=signature_version,
+                                max_pool_connections=max_pool_connections,
+                                retries={'max_attempts': max_attempts, 'mode': 'adaptive'})
+                ClientManager._clients[key] = session.client(service_name, config=config)
+            return ClientManager._clients[key]
+
+    @staticmethod
+    def clear():
+        '''
+        Drop every shared client. ex) after static credentials are replaced in the environment.
+
+        :return:
+        '''
+        with ClientManager._lock:
+            ClientManager._clients.clear()
@@ -2,12 +2,13 @@ import traceback
 
 import boto3
 
+from baram.client_manager import ClientManager
 from baram.log_manager import LogManager
 
 
 class EC2Manager:
     def __init__(self):
-        self.cli = boto3.client('ec2')
+        self.cli = ClientManager.get_client('ec2')
 
         self.logger = LogManager.get_logger()
 
@@ -1,11 +1,11 @@
 import base64
 
-import boto3
+from baram.client_manager import ClientManager
 
 
 class ECRManager:
     def __init__(self):
-        self.cli = boto3.client('ecr')
+        self.cli = ClientManager.get_client('ecr')
 
     def describe_repositories(self,
                               max_results=100,
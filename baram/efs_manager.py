@@ -1,13 +1,12 @@
 import traceback
 
-import boto3
-
+from baram.client_manager import ClientManager
 from baram.log_manager import LogManager
 
 
 class EFSManager:
     def __init__(self):
-        self.cli = boto3.client('efs')
+        self.cli = ClientManager.get_client('efs')
         self.logger = LogManager.get_logger()
 
     def list_efs(self):
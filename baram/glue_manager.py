@@ -1,11 +1,12 @@
 import os
+from functools import cached_property
 from pathlib import Path
 from typing import Optional
 
 import awswrangler as wr
-import boto3
 import fire
 
+from baram.client_manager import ClientManager
 from baram.iam_manager import IAMManager
 from baram.log_manager import LogManager
 from baram.s3_manager import S3Manager
@@ -19,8 +20,7 @@ class GlueManager:
         '''
 
         self.logger = LogManager.get_logger()
-        self.cli = boto3.client('glue')
-        self.im = IAMManager()
+        self.cli = ClientManager.get_client('glue')
 
         self.worker_type = 'G.1X'
         self.workers_num = 2
@@ -31,7 +31,6 @@ class GlueManager:
         self.glue_ver = '3.0'
         self.s3_bucket_name = s3_bucket_name
         self.s3_path = f's3://{self.s3_bucket_name}'
-        self.sm = S3Manager(self.s3_bucket_name)
         self.TABLE_PATH_PREFIX = table_path_prefix
         self.MAX_RESULTS = 1000
         self.GLUE_TYPE_ETL = 'glueetl'
@@ -53,6 +52,14 @@ class GlueManager:
             '--encryption-type': 'sse-kms'
         }
 
+    @cached_property
+    def im(self) -> IAMManager:
+        return IAMManager()
+
+    @cached_property
+    def sm(self) -> S3Manager:
+        return S3Manager(self.s3_bucket_name)
+
     def start_job_run(self, name: str):
         '''
 
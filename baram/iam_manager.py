@@ -1,12 +1,12 @@
 import fire
-import boto3
 
+from baram.client_manager import ClientManager
 from baram.log_manager import LogManager
 
 
 class IAMManager:
     def __init__(self):
-        self.cli = boto3.client('iam')
+        self.cli = ClientManager.get_client('iam')
         self.logger = LogManager.get_logger()
 
     def get_role(self, role_name):
@@ -1,13 +1,11 @@
 from typing import Optional
 
-import boto3
-from botocore.config import Config
+from baram.client_manager import ClientManager
 
 
 class KMSManager:
     def __init__(self, region: Optional[str] = 'ap-northeast-2'):
-        config = Config(region_name=region, signature_version='v4')
-        self.cli = boto3.client('kms', config=config)
+        self.cli = ClientManager.get_client('kms', region=region, signature_version='v4')
 
     def list_keys(self):
         '''
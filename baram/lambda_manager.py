@@ -1,8 +1,7 @@
 import os
 import tempfile
 
-import boto3
-
+from baram.client_manager import ClientManager
 from baram.s3_manager import S3Manager
 from baram.log_manager import LogManager
 from baram.process_manager import ProcessManager
@@ -10,7 +9,7 @@ from baram.process_manager import ProcessManager
 
 class LambdaManager:
     def __init__(self):
-        self.cli = boto3.client('lambda')
+        self.cli = ClientManager.get_client('lambda')
         self.logger = LogManager.get_logger('LambdaManager')
 
     def list_layers(self):
@@ -1,13 +1,14 @@
 from datetime import datetime
 from typing import Union, Type
 
-import boto3
 import tzlocal
 
+from baram.client_manager import ClientManager
+
 
 class QuicksightManager:
     def __init__(self):
-        self.cli = boto3.client('quicksight')
+        self.cli = ClientManager.get_client('quicksight')
         self.TIMEZONE = tzlocal.get_localzone().key
 
     def describe_dataset_refresh_properties(self, account_id: str, dataset_id: str):
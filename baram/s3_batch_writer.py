@@ -0,0 +1,126 @@
+import io
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Iterable, Optional
+
+import ujson
+
+if TYPE_CHECKING:
+    from baram.s3_manager import S3Manager
+
+
+class S3BatchWriter:
+    '''
+    Buffered writer that packs records into a few large NDJSON or Parquet objects under a prefix.
+    A new object is rolled when the batch reaches max_bytes of encoded records or max_records.
+    Batches are encoded and uploaded in the background while the next one fills,
+    with at most max_pending batches waiting, and the last batch is flushed on close.
+
+    ex)
+        with sm.batch_writer('crawl_data/2024-10-01', compression='gzip') as writer:
+            for record in records:
+                writer.write(record)
+    '''
+
+    _EXTENSIONS = {'ndjson': '.ndjson', 'parquet': '.parquet'}
+    _COMPRESSION_EXTENSIONS = {'gzip': '.gz', 'zstd': '.zst'}
+
+    def __init__(self, sm: 'S3Manager', prefix: str, fmt: str = 'ndjson', compression: Optional[str] = None,
+                 max_bytes: int = 128 * 1024 * 1024, max_records: int = 1000000, max_pending: int = 2):
+        '''
+
+        :param sm: S3Manager of the destination bucket
+        :param prefix: destination s3 path. ex) crawl_data/2024-10-01
+        :param fmt: ndjson or parquet
+        :param compression: gzip or zstd. ndjson objects get Content-Encoding and a .gz/.zst extension.
+                            parquet uses it as the column codec. default is snappy for parquet.
+        :param max_bytes: roll a new object at this many bytes of encoded records
+        :param max_records: roll a new object at this many records
+        :param max_pending: the max number of batches waiting to be uploaded
+        '''
+        if fmt not in self._EXTENSIONS:
+            raise ValueError(f'unsupported format {fmt}')
+        self.sm, self.prefix, self.fmt, self.compression = sm, prefix.rstrip('/'), fmt, compression
+        self.max_bytes, self.max_records, self.max_pending = max_bytes, max_records, max_pending
+        self.name = f'{datetime.now(timezone.utc):%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}'
+        self.executor = ThreadPoolExecutor(max_workers=max_pending)
+        self.pending = deque()
+        self.batch, self.batch_bytes, self.parts = [], 0, 0
+        self.keys, self.records = [], 0
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, record: dict):
+        '''
+        Add a record to the current batch, rolling a new object if the batch is full.
+
+        :param record: dict data
+        :return:
+        '''
+        if self.closed:
+            raise ValueError('write to a closed S3BatchWriter')
+        line = ujson.dumps(record).encode() + b'\n'
+        self.batch.append(line if self.fmt == 'ndjson' else record)
+        self.batch_bytes += len(line)
+        self.records += 1
+        if self.batch_bytes >= self.max_bytes or len(self.batch) >= self.max_records:
+            self.flush()
+
+    def write_many(self, records: Iterable[dict]):
+        '''
+        :param records: dict data
+        :return:
+        '''
+        for record in records:
+            self.write(record)
+
+    def flush(self):
+        '''
+        Upload the current batch as a new object in the background.
+
+        :return:
+        '''
+        if not self.batch:
+            return
+        while len(self.pending) >= self.max_pending:
+            self.pending.popleft().result()
+        extension = self._EXTENSIONS[self.fmt]
+        if self.fmt == 'ndjson' and self.compression:
+            extension += self._COMPRESSION_EXTENSIONS[self.compression]
+        key = f'{self.prefix}/part-{self.name}-{self.parts:05d}{extension}'
+        self.pending.append(self.executor.submit(self._upload, key, self.batch))
+        self.keys.append(key)
+        self.batch, self.batch_bytes, self.parts = [], 0, self.parts + 1
+
+    def close(self) -> list:
+        '''
+        Flush the last batch and wait for every upload.
+
+        :return: written s3 keys
+        '''
+        if not self.closed:
+            self.closed = True
+            try:
+                self.flush()
+                while self.pending:
+                    self.pending.popleft().result()
+            finally:
+                self.executor.shutdown(wait=True)
+            self.sm.logger.info(f'write {self.records} records to {len(self.keys)} objects under {self.prefix}')
+        return self.keys
+
+    def _upload(self, key: str, batch: list):
+        if self.fmt == 'ndjson':
+            return self.sm.put_object(key, b''.join(batch), compression=self.compression)
+        import pandas as pd
+
+        buffer = io.BytesIO()
+        pd.DataFrame.from_records(batch).to_parquet(buffer, index=False, compression=self.compression or 'snappy')
+        return self.sm.put_object(key, buffer.getvalue())
@@ -0,0 +1,173 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from baram.s3_manager import S3Manager
+
+
+class S3ListingIndex:
+    '''
+    Local SQLite index of the keys, sizes, ETags, storage classes and modification times under bucket prefixes.
+    A prefix is listed once, then list, exists, size and glob queries under it are answered locally.
+    Incremental refresh lists only keys after the last indexed one with StartAfter,
+    which catches every change of append-only, time-ordered layouts. A full refresh also drops deleted keys.
+    '''
+
+    def __init__(self, sm: 'S3Manager', index_path: str, max_age: Optional[float] = None):
+        '''
+
+        :param sm: S3Manager of the indexed bucket
+        :param index_path: sqlite file path. ex) /tmp/baram_index.db
+        :param max_age: seconds after which a query refreshes its prefix incrementally first. None never does.
+        '''
+        self.sm, self.bucket_name, self.max_age = sm, sm.bucket_name, max_age
+        os.makedirs(os.path.dirname(index_path) or '.', exist_ok=True)
+        self.lock = threading.RLock()
+        self.db = sqlite3.connect(index_path, check_same_thread=False)
+        self.db.execute('create table if not exists objects (bucket text, key text, size integer, etag text, '
+                        'storage_class text, last_modified real, primary key (bucket, key))')
+        self.db.execute('create table if not exists prefixes (bucket text, prefix text, refreshed real, '
+                        'primary key (bucket, prefix))')
+        self.db.commit()
+
+    @staticmethod
+    def _key_range(prefix: str) -> tuple:
+        return prefix, prefix + '\U0010ffff'
+
+    def _covering_prefix(self, prefix: str) -> Optional[tuple]:
+        with self.lock:
+            rows = self.db.execute('select prefix, refreshed from prefixes where bucket = ?',
+                                   (self.bucket_name,)).fetchall()
+        covering = [row for row in rows if prefix.startswith(row[0])]
+        return max(covering, key=lambda row: len(row[0])) if covering else None
+
+    def _ensure(self, prefix: str):
+        covering = self._covering_prefix(prefix)
+        if covering is None:
+            self.refresh(prefix, incremental=False)
+        elif self.max_age is not None and time.time() - covering[1] > self.max_age:
+            self.refresh(covering[0])
+
+    def refresh(self, prefix: str = '', incremental: bool = True, depth: int = 0) -> int:
+        '''
+        Update the index of a prefix.
+
+        :param prefix: s3 prefix. ex) crawl_data/
+        :param incremental: list only keys after the last indexed key of an already indexed prefix.
+        :param depth: list shards this many '/' levels below prefix in parallel for a full refresh. 0 lists serially.
+        :return: the number of listed objects
+        '''
+        covering = self._covering_prefix(prefix) if incremental else None
+        first, last = self._key_range(covering[0] if covering else prefix)
+        with self.lock:
+            start_after = self.db.execute('select max(key) from objects where bucket = ? and key >= ? and key < ?',
+                                          (self.bucket_name, first, last)).fetchone()[0] if covering else None
+        if covering:
+            prefix = covering[0]
+            objs = self.sm.iter_objects(prefix, start_after=start_after)
+        else:
+            objs = self.sm.iter_objects_parallel(prefix, depth=depth) if depth else self.sm.iter_objects(prefix)
+
+        count, started = 0, time.time()
+        with self.lock:
+            if not covering:
+                self.db.execute('delete from objects where bucket = ? and key >= ? and key < ?',
+                                (self.bucket_name, first, last))
+            for obj in objs:
+                self.db.execute('insert or replace into objects values (?, ?, ?, ?, ?, ?)',
+                                (self.bucket_name, obj['Key'], obj['Size'], obj['ETag'],
+                                 obj.get('StorageClass', 'STANDARD'), obj['LastModified'].timestamp()))
+                count += 1
+            self.db.execute('insert or replace into prefixes values (?, ?, ?)', (self.bucket_name, prefix, started))
+            self.db.commit()
+        self.sm.logger.info(f'index {count} objects under s3://{self.bucket_name}/{prefix}')
+        return count
+
+    def list_objects(self, prefix: str = '') -> Optional[list]:
+        '''
+        List indexed objects in the shape of S3Manager.list_objects.
+
+        :param prefix: Limits the response to keys that begin with the specified prefix.
+        :return: list of objects or None
+        '''
+        self._ensure(prefix)
+        with self.lock:
+            rows = self.db.execute('select key, size, etag, storage_class, last_modified from objects '
+                                   'where bucket = ? and key >= ? and key < ? order by key',
+                                   (self.bucket_name, *self._key_range(prefix))).fetchall()
+        objects = [{'Key': key, 'Size': size, 'ETag': etag, 'StorageClass': storage_class,
+                    'LastModified': datetime.fromtimestamp(last_modified, timezone.utc)}
+                   for key, size, etag, storage_class, last_modified in rows]
+        return objects if objects else None
+
+    def list_object_keys(self, prefix: str = '') -> Optional[list]:
+        '''
+        :param prefix: Limits the response to keys that begin with the specified prefix.
+        :return: list of key strings or None
+        '''
+        self._ensure(prefix)
+        with self.lock:
+            keys = [row[0] for row in self.db.execute('select key from objects where bucket = ? and key >= ? '
+                                                      'and key < ? order by key',
+                                                      (self.bucket_name, *self._key_range(prefix)))]
+        return keys if keys else None
+
+    def list_dir(self, prefix: str = '', delimiter: str = '/') -> list:
+        '''
+        List keys and then sub prefixes directly under prefix, like S3Manager.list_dir.
+
+        :param prefix: Limits the response to keys that begin with the specified prefix.
+        :param delimiter: A delimiter is a character you use to group keys.
+        :return: keys and sub prefixes
+        '''
+        self._ensure(prefix)
+        with self.lock:
+            return [row[0] for row in self.db.execute(
+                'select distinct case when pos > 0 then substr(key, 1, ? + pos + ? - 1) else key end as entry, '
+                'pos > 0 as is_prefix from (select key, instr(substr(key, ?), ?) as pos from objects '
+                'where bucket = ? and key >= ? and key < ?) order by is_prefix, entry',
+                (len(prefix), len(delimiter), len(prefix) + 1, delimiter, self.bucket_name,
+                 *self._key_range(prefix)))]
+
+    def exists(self, s3_key_id: str) -> bool:
+        '''
+        :param s3_key_id: s3 key id. ex) nylon-detector/a.csv
+        :return: True if the key is indexed
+        '''
+        self._ensure(s3_key_id)
+        with self.lock:
+            return self.db.execute('select 1 from objects where bucket = ? and key = ?',
+                                   (self.bucket_name, s3_key_id)).fetchone() is not None
+
+    def get_size(self, prefix: str = '') -> dict:
+        '''
+        Total size of the objects under prefix.
+
+        :param prefix: s3 prefix. ex) crawl_data/
+        :return: ex) {'bytes': 1024, 'count': 3}
+        '''
+        self._ensure(prefix)
+        with self.lock:
+            total, count = self.db.execute('select coalesce(sum(size), 0), count(*) from objects '
+                                           'where bucket = ? and key >= ? and key < ?',
+                                           (self.bucket_name, *self._key_range(prefix))).fetchone()
+        return {'bytes': total, 'count': count}
+
+    def glob(self, pattern: str) -> list:
+        '''
+        Keys matching a glob pattern. * and ? also match /.
+
+        :param pattern: ex) crawl_data/2024-10-*/*.json
+        :return: matching keys
+        '''
+        prefix = re.split(r'[*?\[]', pattern, maxsplit=1)[0]
+        self._ensure(prefix)
+        with self.lock:
+            return [row[0] for row in self.db.execute('select key from objects where bucket = ? and key >= ? '
+                                                      'and key < ? and key glob ? order by key',
+                                                      (self.bucket_name, *self._key_range(prefix), pattern))]
@@ -1,33 +1,641 @@
+import base64
+import gzip
+import hashlib
+import heapq
+import io
+import itertools
+import mmap
 import os
+import re
+import shutil
 import tempfile
+from collections import Counter, deque
+import threading
+import time
+import zlib
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from datetime import datetime, timezone
-from typing import Optional
+from functools import cached_property
+from typing import Callable, Iterable, Optional
 
 import awswrangler as wr
-import boto3
 import botocore
 import ujson
 from avro.datafile import DataFileReader
 from avro.io import DatumReader
-from botocore.client import Config
+from avro.schema import parse as parse_avro_schema
+from boto3.s3.transfer import TransferConfig, create_transfer_manager
+from s3transfer.subscribers import BaseSubscriber
 
+from baram.client_manager import ClientManager
 from baram.kms_manager import KMSManager
 from baram.log_manager import LogManager
+from baram.s3_batch_writer import S3BatchWriter
+from baram.s3_listing_index import S3ListingIndex
+from baram.s3_object_cache import S3ObjectCache
+
+_ARCHIVED_STORAGE_CLASSES = ('GLACIER', 'DEEP_ARCHIVE')
+_COPIED_HEAD_FIELDS = ('CacheControl', 'ContentDisposition', 'ContentEncoding', 'ContentLanguage', 'ContentType',
+                       'Metadata')
+_CONTENT_ENCODING_EXTENSIONS = {'.gz': 'gzip', '.zst': 'zstd'}
+_NON_BLANK_LINE_END = re.compile(rb'[^\r\n]\r?\n')
+
+
+_ACCESS_LOG_TOKEN = re.compile(r'\[[^\]]*\]|"(?:[^"\\]|\\.)*"|\S+')
+_ACCESS_LOG_PARTITIONED_KEY = re.compile(r'\d{4}/\d{2}/\d{2}/')
+_ACCESS_LOG_TIMESTAMP_KEY = re.compile(r'\d{4}-\d{2}-\d{2}-\d{2}-\d{2}-\d{2}-')
+# See https://docs.aws.amazon.com/AmazonS3/latest/userguide/LogFormat.html
+_ACCESS_LOG_FIELDS = ('bucket_owner', 'bucket', 'time', 'remote_ip', 'requester', 'request_id', 'operation', 'key',
+                      'request_uri', 'http_status', 'error_code', 'bytes_sent', 'object_size', 'total_time',
+                      'turn_around_time', 'referer', 'user_agent', 'version_id', 'host_id', 'signature_version',
+                      'cipher_suite', 'authentication_type', 'host_header', 'tls_version', 'access_point_arn',
+                      'acl_required')
+_ACCESS_LOG_INT_FIELDS = ('http_status', 'bytes_sent', 'object_size', 'total_time', 'turn_around_time')
+
+
+def _bounded_map(executor, fn: Callable, iterable: Iterable, max_in_flight: int, ordered: bool = True):
+    '''
+    Like executor.map, but consumes iterable lazily and keeps at most max_in_flight calls submitted.
+
+    :param executor: thread or process pool executor
+    :param fn: function to call with each item
+    :param iterable: items, possibly a generator
+    :param max_in_flight: the max number of submitted calls
+    :param ordered: yield results in input order. otherwise in completion order.
+    :return: generator of results
+    '''
+    pending = deque()
+    for item in iterable:
+        if len(pending) >= max_in_flight:
+            if ordered:
+                yield pending.popleft().result()
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.remove(future)
+                    yield future.result()
+        pending.append(executor.submit(fn, item))
+    while pending:
+        yield pending.popleft().result()
+
+
+def _split_access_log_line(line: str) -> list:
+    '''
+    Split an S3 server access log line into fields, keeping quoted and bracketed fields whole.
+
+    :param line: access log line
+    :return: fields without quotes and brackets
+    '''
+    return [t[1:-1] if t[0] in '["' else t for t in _ACCESS_LOG_TOKEN.findall(line)]
+
+
+def _count_access_log_lines(lines) -> Counter:
+    '''
+    Count access log lines by (count type, target bucket, resource).
+
+    :param lines: iterable of str or bytes lines, or the whole log as bytes
+    :return: counter
+    '''
+    if isinstance(lines, bytes):
+        lines = lines.splitlines()
+    counter = Counter()
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        token = _split_access_log_line(line)
+        if len(token) < 9:
+            continue
+        request = token[8].split(' ')
+        if len(request) < 2:
+            continue
+        cnt_type = 'read' if request[0] in ('GET', 'HEAD') else 'write'
+        counter[(cnt_type, token[1], request[1])] += 1
+    return counter
+
+
+def _parse_access_log_columns(lines) -> dict:
+    '''
+    Parse access log lines into raw string columns named by _ACCESS_LOG_FIELDS.
+    Missing trailing fields are None, and fields added to the format later are ignored.
+
+    :param lines: iterable of str or bytes lines, or the whole log as bytes
+    :return: dict of column name to list of values
+    '''
+    if isinstance(lines, bytes):
+        lines = lines.splitlines()
+    n = len(_ACCESS_LOG_FIELDS)
+    rows = []
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        token = _split_access_log_line(line)
+        if len(token) < 9:
+            continue
+        rows.append(token[:n] if len(token) >= n else token + [None] * (n - len(token)))
+    columns = zip(*rows) if rows else [()] * n
+    return {name: list(values) for name, values in zip(_ACCESS_LOG_FIELDS, columns)}
+
+
+def _access_log_columns_to_dataframe(columns: dict):
+    '''
+    Convert raw access log columns to typed DataFrame columns in one vectorized pass.
+    '-' becomes null, numeric fields become Int64, time becomes UTC timestamp and a date column is added.
+
+    :param columns: columns of _parse_access_log_columns
+    :return: DataFrame
+    '''
+    import pandas as pd
+
+    df = pd.DataFrame(columns, columns=list(_ACCESS_LOG_FIELDS), dtype='object')
+    df = df.mask(df.eq('-'))
+    for name in _ACCESS_LOG_INT_FIELDS:
+        df[name] = pd.to_numeric(df[name], errors='coerce').astype('Int64')
+    df['time'] = pd.to_datetime(df['time'], format='%d/%b/%Y:%H:%M:%S %z', errors='coerce', utc=True)
+    df['date'] = df['time'].dt.strftime('%Y-%m-%d')
+    return df
+
+
+def _split_line_chunk(data: bytes, encoding: str = 'utf-8', parse_fn: Optional[Callable] = None):
+    '''
+    Decode a chunk of complete lines and split it on \\n, dropping a trailing \\r of CRLF.
+
+    :param data: bytes ending with \\n or at the end of the object
+    :param encoding: ASCII compatible encoding
+    :param parse_fn: module level function applied to the list of lines
+    :return: lines, or parse_fn(lines)
+    '''
+    lines = data.decode(encoding).split('\n')
+    if lines and lines[-1] == '':
+        lines.pop()
+    lines = [line[:-1] if line.endswith('\r') else line for line in lines]
+    return parse_fn(lines) if parse_fn else lines
+
+
+class _HyperLogLog:
+    '''
+    HyperLogLog distinct counter over 64-bit hashes, with linear counting for small cardinalities.
+    The standard error is about 1.04 / sqrt(2 ** p), 0.8% for the default p.
+    '''
+
+    def __init__(self, p: int = 14):
+        import numpy as np
+
+        self.p, self.m = p, 1 << p
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    def add_hashes(self, hashes):
+        '''
+        Add uint64 hashes. ex) pd.util.hash_pandas_object(series, index=False).values
+
+        :param hashes: numpy array of uint64
+        :return:
+        '''
+        import numpy as np
+
+        bits = 64 - self.p
+        idx = (hashes >> np.uint64(bits)).astype(np.int64)
+        w = (hashes & np.uint64((1 << bits) - 1)).astype(np.float64)
+        bit_length = np.where(w > 0, np.floor(np.log2(np.maximum(w, 1))) + 1, 0)
+        rho = (bits - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, idx, rho)
+
+    def count(self) -> int:
+        import numpy as np
+
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m * self.m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * self.m and zeros:
+            estimate = self.m * np.log(self.m / zeros)
+        return int(round(estimate))
+
+
+def _get_content_encoding(s3_key_id: str, content_encoding: Optional[str] = None) -> Optional[str]:
+    '''
+    Get the compression of an object from its Content-Encoding, or else from its extension.
+
+    :param s3_key_id: s3 key id. ex) nylon-detector/a.json.gz
+    :param content_encoding: Content-Encoding of the object
+    :return: gzip, zstd or None
+    '''
+    if content_encoding in ('gzip', 'zstd'):
+        return content_encoding
+    return _CONTENT_ENCODING_EXTENSIONS.get(os.path.splitext(s3_key_id)[1])
+
+
+def _compressobj(compression: str):
+    '''
+    :param compression: gzip or zstd. zstd needs the zstandard package.
+    :return: object with compress(data) and flush()
+    '''
+    if compression == 'gzip':
+        return zlib.compressobj(wbits=31)
+    if compression == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor().compressobj()
+    raise ValueError(f'unsupported compression {compression}')
+
+
+def _decompress(data: bytes, compression: Optional[str]) -> bytes:
+    if compression == 'gzip':
+        return gzip.decompress(data)
+    if compression == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data)).read()
+    return data
+
+
+def _decompressing_reader(raw, compression: Optional[str]):
+    '''
+    Wrap a binary stream so it is decompressed while it is read.
+
+    :param raw: binary stream. ex) StreamingBody
+    :param compression: gzip, zstd or None
+    :return: binary stream
+    '''
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=raw)
+    if compression == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().stream_reader(raw)
+    return raw
+
+
+class _CompressingReader(io.RawIOBase):
+    '''
+    Non-seekable stream of the compressed bytes of another stream, compressed as it is read.
+    Wrap it in io.BufferedReader so that read(n) returns full parts for multipart upload.
+    '''
+
+    def __init__(self, fileobj, compression: str, block_size: int = 1024 * 1024):
+        self.fileobj, self.block_size = fileobj, block_size
+        self.compressor = _compressobj(compression)
+        self.buffer, self.eof = b'', False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self.buffer and not self.eof:
+            block = self.fileobj.read(self.block_size)
+            if block:
+                self.buffer = self.compressor.compress(block.encode() if isinstance(block, str) else block)
+            else:
+                self.buffer, self.eof = self.compressor.flush(), True
+        n = min(len(b), len(self.buffer))
+        b[:n] = self.buffer[:n]
+        self.buffer = self.buffer[n:]
+        return n
+
+
+class _S3RangeReader(io.RawIOBase):
+    '''
+    Seekable read-only file over ranged GETs of one S3 object.
+    Every GET is pinned to the ETag seen at open, so a concurrent overwrite fails instead of mixing versions.
+    Wrap it in io.BufferedReader so each GET fetches a whole buffer.
+    '''
+
+    def __init__(self, cli, bucket_name: str, key: str):
+        head = cli.head_object(Bucket=bucket_name, Key=key)
+        self.cli, self.bucket_name, self.key = cli, bucket_name, key
+        self.size, self.etag = head['ContentLength'], head['ETag']
+        self.pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.pos, io.SEEK_END: self.size}[whence]
+        self.pos = max(base + offset, 0)
+        return self.pos
+
+    def readinto(self, b) -> int:
+        if self.pos >= self.size or not len(b):
+            return 0
+        end = min(self.pos + len(b), self.size) - 1
+        data = self.cli.get_object(Bucket=self.bucket_name, Key=self.key, Range=f'bytes={self.pos}-{end}',
+                                   IfMatch=self.etag)['Body'].read()
+        b[:len(data)] = data
+        self.pos += len(data)
+        return len(data)
+
+
+class _ProvideSizeSubscriber(BaseSubscriber):
+    '''
+    Provide the object size known from listing, so a managed copy does not HEAD the source again.
+    '''
+
+    def __init__(self, size: int):
+        self.size = size
+
+    def on_queued(self, future, **kwargs):
+        future.meta.provide_transfer_size(self.size)
+
+
+class _ShardLister:
+    '''
+    Lists shards of the key space page by page on a thread pool for S3Manager.iter_objects_parallel.
+    A shard is a dict of prefix, start_after, until and depth. A shard with depth lists with '/' as delimiter
+    and its CommonPrefixes become new shards with depth - 1.
+    Listed but unconsumed objects, counting each LIST in flight as a full page, are capped at max_buffered
+    across all shards. Waiting shards are listed in key order, so in ordered mode the shards just ahead of
+    the one being drained go first, and the drained shard may always list up to two pages ahead of the consumer.
+    Shard items are (shard, kind, payload) with kind page, shard, error or done.
+    '''
+
+    def __init__(self, cli, bucket_name: str, max_workers: int, max_buffered: int, ordered: bool):
+        self.cli = cli
+        self.bucket_name = bucket_name
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.max_buffered = max_buffered
+        self.ordered = ordered
+        self.cond = threading.Condition()
+        self.waiting = []
+        self.seq = itertools.count()
+        self.running = 0
+        self.buffered = 0
+        self.head = None
+        self.items = deque()
+        self.closed = False
+
+    def add(self, prefix: str, start_after: Optional[str] = None, until: Optional[str] = None,
+            depth: int = 0) -> dict:
+        '''
+        Add a shard to be listed.
+
+        :param prefix: shard prefix
+        :param start_after: list keys after this key
+        :param until: list keys up to this key
+        :param depth: how many '/' levels below prefix to discover shards
+        :return: shard
+        '''
+        with self.cond:
+            shard = self._new_shard(prefix, start_after, until, depth)
+            self._schedule()
+        return shard
+
+    def pages(self, shards: list):
+        '''
+        Yield pages of the shards, including discovered ones, in key order if ordered else as they arrive.
+
+        :param shards: top level shards
+        :return: generator of pages
+        '''
+        if self.ordered:
+            for shard in shards:
+                yield from self._drain(shard)
+            return
+        remaining = len(shards)
+        while remaining:
+            _, kind, payload = self._get(None)
+            if kind == 'page':
+                yield payload
+            elif kind == 'shard':
+                remaining += 1
+            elif kind == 'error':
+                raise payload
+            elif kind == 'done':
+                remaining -= 1
+
+    def close(self):
+        '''
+        Stop listing and wait for LIST calls in flight.
+
+        :return:
+        '''
+        with self.cond:
+            self.closed = True
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def _drain(self, shard: dict):
+        while True:
+            _, kind, payload = self._get(shard)
+            if kind == 'page':
+                yield payload
+            elif kind == 'shard':
+                yield from self._drain(payload)
+            elif kind == 'error':
+                raise payload
+            else:
+                return
+
+    def _get(self, shard: Optional[dict]) -> tuple:
+        with self.cond:
+            if self.ordered and self.head is not shard:
+                self.head = shard
+                self._schedule()
+            items = shard['items'] if self.ordered else self.items
+            while not items:
+                self.cond.wait()
+            item = items.popleft()
+            if item[1] == 'page':
+                self.buffered -= len(item[2])
+                item[0]['buffered'] -= len(item[2])
+                self._schedule()
+            return item
+
+    def _new_shard(self, prefix: str, start_after: Optional[str], until: Optional[str], depth: int) -> dict:
+        shard = {'prefix': prefix, 'start_after': start_after, 'until': until, 'depth': depth, 'token': None,
+                 'items': deque() if self.ordered else self.items, 'buffered': 0, 'seq': None}
+        self._wait(shard, start_after or prefix)
+        return shard
+
+    def _wait(self, shard: dict, position: str):
+        shard['seq'] = next(self.seq)
+        heapq.heappush(self.waiting, (position, shard['seq'], shard))
+
+    def _schedule(self):
+        if self.closed:
+            return
+        head = self.head
+        if head is not None and head['seq'] is not None and head['buffered'] < 2 * 1000:
+            self._start(head)
+        while self.waiting and self.buffered + 1000 * self.running < self.max_buffered:
+            _, seq, shard = heapq.heappop(self.waiting)
+            if shard['seq'] == seq:
+                self._start(shard)
+
+    def _start(self, shard: dict):
+        shard['seq'] = None
+        self.running += 1
+        self.executor.submit(self._list_page, shard)
+
+    def _list_page(self, shard: dict):
+        items = shard['items']
+        try:
+            if self.closed:
+                return
+            kwargs = {'Bucket': self.bucket_name, 'Prefix': shard['prefix']}
+            if shard['depth']:
+                kwargs['Delimiter'] = '/'
+            if shard['token']:
+                kwargs['ContinuationToken'] = shard['token']
+            elif shard['start_after']:
+                kwargs['StartAfter'] = shard['start_after']
+            response = self.cli.list_objects_v2(**kwargs)
+        except Exception as e:
+            with self.cond:
+                self.running -= 1
+                items.append((shard, 'error', e))
+                self.cond.notify_all()
+            return
+
+        objects = response.get('Contents', [])
+        finished = 'NextContinuationToken' not in response
+        if shard['until'] is not None and objects and objects[-1]['Key'] > shard['until']:
+            objects = [obj for obj in objects if obj['Key'] <= shard['until']]
+            finished = True
+        entries = sorted([(obj['Key'], obj) for obj in objects] +
+                         [(p['Prefix'], None) for p in response.get('CommonPrefixes', [])], key=lambda x: x[0])
+        with self.cond:
+            self.running -= 1
+            page = []
+            for key, obj in entries + [(None, None)]:
+                if obj is not None:
+                    page.append(obj)
+                    continue
+                if page:
+                    items.append((shard, 'page', page))
+                    page = []
+                if key is not None:
+                    items.append((shard, 'shard', self._new_shard(key, None, None, shard['depth'] - 1)))
+            self.buffered += len(objects)
+            shard['buffered'] += len(objects)
+            if finished:
+                items.append((shard, 'done', None))
+            else:
+                shard['token'] = response['NextContinuationToken']
+                self._wait(shard, entries[-1][0] if entries else shard['start_after'] or shard['prefix'])
+            self.cond.notify_all()
+            self._schedule()
 
 
 class S3Manager:
-    def __init__(self, bucket_name: str, region: Optional[str] = 'ap-northeast-2'):
+    DOWNLOAD_MANIFEST_DIR = os.path.join(tempfile.gettempdir(), 'baram_download_manifests')
+    BUCKET_METADATA_TTL = 3600
+    _bucket_metadata = {}
+    _bucket_metadata_lock = threading.Lock()
+    _ACCESS_LOG_STATS_HEADERS = ["Count Type", "Target Bucket", "Resource", "Value"]
+
+    def __init__(self, bucket_name: str, region: Optional[str] = 'ap-northeast-2', max_workers: int = 32):
+        '''
 
-        config = Config(region_name=region, signature_version='v4')
-        self.cli = boto3.client('s3', config=config)
-        self.km = KMSManager(region=region)
+        :param bucket_name: s3 bucket name
+        :param region: aws region
+        :param max_workers: max concurrent requests for bulk operations, also used as connection pool size.
+        '''
+
+        self.max_workers = max_workers
+        self.cli = ClientManager.get_client('s3', region=region, max_pool_connections=max_workers,
+                                            signature_version='v4')
+        self.transfer_config = TransferConfig(multipart_chunksize=16 * 1024 * 1024, max_concurrency=max_workers)
+        self.region = region
         self.logger = LogManager.get_logger('S3Manager')
         self.bucket_name = bucket_name
-        try:
-            bi = self.get_bucket_encryption()
-            self.kms_algorithm, self.kms_id = bi['SSEAlgorithm'], bi['KMSMasterKeyID']
-        except (botocore.exceptions.ClientError, KeyError, TypeError):
-            self.kms_algorithm, self.kms_id = None, None
+        self.cache = None
+
+    @cached_property
+    def km(self) -> KMSManager:
+        return KMSManager(region=self.region)
+
+    @property
+    def kms_algorithm(self) -> Optional[str]:
+        return self._get_bucket_encryption_info()[0]
+
+    @property
+    def kms_id(self) -> Optional[str]:
+        return self._get_bucket_encryption_info()[1]
+
+    def _get_bucket_encryption_info(self) -> tuple:
+        '''
+        Get the default KMS encryption of the bucket, cached per bucket.
+
+        :return: (SSEAlgorithm, KMSMasterKeyID), or (None, None) without a KMS key.
+        '''
+
+        def load():
+            try:
+                bi = self.get_bucket_encryption()
+                return bi['SSEAlgorithm'], bi['KMSMasterKeyID']
+            except (botocore.exceptions.ClientError, KeyError, TypeError):
+                return None, None
+
+        return self._get_bucket_metadata('encryption', load)
+
+    def _get_bucket_metadata(self, field: str, load: Callable, bucket_name: Optional[str] = None,
+                             cache_if: Callable = lambda value: True):
+        '''
+        Get bucket metadata from the process-wide cache, loading it on first use or after BUCKET_METADATA_TTL seconds.
+
+        :param field: metadata name. ex) encryption
+        :param load: function loading the metadata
+        :param bucket_name: bucket name, defaults to instance bucket
+        :param cache_if: cache the loaded value only if this returns True
+        :return: metadata
+        '''
+        key = (bucket_name or self.bucket_name, field)
+        with S3Manager._bucket_metadata_lock:
+            cached = S3Manager._bucket_metadata.get(key)
+        if cached and time.monotonic() - cached[0] < self.BUCKET_METADATA_TTL:
+            return cached[1]
+        value = load()
+        if cache_if(value):
+            with S3Manager._bucket_metadata_lock:
+                S3Manager._bucket_metadata[key] = (time.monotonic(), value)
+        return value
+
+    @staticmethod
+    def clear_bucket_metadata():
+        '''
+        Drop cached bucket encryption, location and existence.
+
+        :return:
+        '''
+        with S3Manager._bucket_metadata_lock:
+            S3Manager._bucket_metadata.clear()
+
+    def enable_cache(self, cache_dir: str, max_bytes: int = 1024 * 1024 * 1024, ttl: Optional[float] = None):
+        '''
+        Serve get_object, get_object_as_json and download_file from a local disk cache.
+
+        :param cache_dir: cache directory. ex) /tmp/baram_cache
+        :param max_bytes: the max total size of cached objects, least recently used ones are evicted first.
+        :param ttl: seconds a cached object is used without revalidation. None revalidates with IfNoneMatch every time.
+        :return: S3ObjectCache. its stats() returns hit/miss counters.
+        '''
+        self.cache = S3ObjectCache(cache_dir, max_bytes=max_bytes, ttl=ttl)
+        return self.cache
+
+    def batch_writer(self, prefix: str, fmt: str = 'ndjson', compression: Optional[str] = None,
+                     max_bytes: int = 128 * 1024 * 1024, max_records: int = 1000000) -> S3BatchWriter:
+        '''
+        Open a writer that batches records into a few large objects instead of one object per record.
+
+        :param prefix: destination s3 path. ex) crawl_data/2024-10-01
+        :param fmt: ndjson or parquet
+        :param compression: gzip or zstd
+        :param max_bytes: roll a new object at this many bytes of encoded records
+        :param max_records: roll a new object at this many records
+        :return: S3BatchWriter. use it with `with`, or call close().
+        '''
+        return S3BatchWriter(self, prefix, fmt=fmt, compression=compression, max_bytes=max_bytes,
+                             max_records=max_records)
+
+    def open_listing_index(self, index_path: str, max_age: Optional[float] = None) -> S3ListingIndex:
+        '''
+        Open a local listing index of this bucket, so repeated listings of the same prefixes are answered locally.
+
+        :param index_path: sqlite file path. ex) /tmp/baram_index.db
+        :param max_age: seconds after which a query refreshes its prefix incrementally first. None never does.
+        :return: S3ListingIndex
+        '''
+        return S3ListingIndex(self, index_path, max_age=max_age)
 
     def list_buckets(self):
         '''
@@ -36,36 +644,129 @@ class S3Manager:
         response = self.cli.list_buckets()
         return response['Buckets'] if 'Buckets' in response else None
 
-    def put_object(self, s3_key_id: str, body):
+    def put_object(self, s3_key_id: str, body, compression: Optional[str] = None):
         '''
 
         :param s3_key_id: s3 key id. ex) nylon-detector/a.csv
         :param body: byte or str data
+        :param compression: gzip or zstd. the object is stored compressed with Content-Encoding set.
         :return: response
         '''
         kwargs = {"Bucket": self.bucket_name,
                   "Key": s3_key_id,
                   "Body": body}
+        if compression:
+            compressor = _compressobj(compression)
+            kwargs['Body'] = compressor.compress(body.encode() if isinstance(body, str) else body) + compressor.flush()
+            kwargs['ContentEncoding'] = compression
         if self.kms_id:
             kwargs['ServerSideEncryption'] = self.kms_algorithm
             kwargs['SSEKMSKeyId'] = self.kms_id
         response = self.cli.put_object(**kwargs)
+        if self.cache:
+            self.cache.invalidate(self.bucket_name, s3_key_id)
         return response
 
-    def get_object(self, s3_key_id: str):
+    def get_object(self, s3_key_id: str, decompress: bool = True):
         '''
 
         :param s3_key_id: s3 key id. ex) nylon-detector/a.csv
+        :param decompress: decompress gzip or zstd objects, known by Content-Encoding or by .gz/.zst extension.
         :return: response
         '''
         try:
-            response = self.cli.get_object(Bucket=self.bucket_name,
-                                           Key=s3_key_id)
-            return response['Body'].read()
+            if self.cache:
+                body = self.cache.get_object(self.cli, self.bucket_name, s3_key_id)
+                content_encoding = self.cache.get_content_encoding(self.bucket_name, s3_key_id)
+            else:
+                response = self.cli.get_object(Bucket=self.bucket_name,
+                                               Key=s3_key_id)
+                body, content_encoding = response['Body'].read(), response.get('ContentEncoding')
+            return _decompress(body, _get_content_encoding(s3_key_id, content_encoding)) if decompress else body
         except self.cli.exceptions.NoSuchKey:
             self.logger.info(f'{s3_key_id} does not exist.')
             return None
 
+    def get_object_parallel(self, s3_key_id: str, buffer=None, local_file_path: Optional[str] = None,
+                            part_size: int = 16 * 1024 * 1024, max_workers: Optional[int] = None,
+                            verify: bool = True):
+        '''
+        Get a large S3 object with concurrent byte-range GETs written straight into one preallocated buffer.
+        Every range is pinned to the ETag seen by HEAD, so all parts come from the same version.
+
+        :param s3_key_id: s3 key id. ex) nylon-detector/a.parquet
+        :param buffer: writable buffer of at least the object size. ex) bytearray, memoryview, mmap
+        :param local_file_path: write into this file through mmap instead of memory.
+        :param part_size: bytes per ranged GET
+        :param max_workers: the number of concurrent GETs. default is self.max_workers
+        :param verify: verify the full-object checksum, or the ETag when it is a plain MD5.
+        :return: the filled buffer, a bytearray by default or an mmap with local_file_path. None if it does not exist.
+                 an empty object can not be mapped, so with local_file_path the file is truncated
+                 and an empty bytearray is returned.
+        '''
+        try:
+            head = self.cli.head_object(Bucket=self.bucket_name, Key=s3_key_id, ChecksumMode='ENABLED')
+        except botocore.exceptions.ClientError as e:
+            if e.response['Error']['Code'] not in ('404', 'NoSuchKey'):
+                raise e
+            self.logger.info(f'{s3_key_id} does not exist.')
+            return None
+        size = head['ContentLength']
+
+        if buffer is None and local_file_path:
+            with open(local_file_path, 'wb+') as f:
+                f.truncate(size)
+                buffer = mmap.mmap(f.fileno(), size) if size else bytearray()
+        elif buffer is None:
+            buffer = bytearray(size)
+        view = memoryview(buffer)
+        assert len(view) >= size, f'buffer is smaller than {size} bytes'
+
+        def fetch(offset: int):
+            end = min(offset + part_size, size) - 1
+            body = self.cli.get_object(Bucket=self.bucket_name, Key=s3_key_id, Range=f'bytes={offset}-{end}',
+                                       IfMatch=head['ETag'])['Body']
+            pos = offset
+            for chunk in body.iter_chunks(1024 * 1024):
+                view[pos:pos + len(chunk)] = chunk
+                pos += len(chunk)
+            if pos != end + 1:
+                raise IOError(f'{s3_key_id} range {offset}-{end} returned {pos - offset} bytes')
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max_workers or self.max_workers) as executor:
+            list(executor.map(fetch, range(0, size, part_size)))
+        if verify:
+            self._verify_checksum(s3_key_id, view[:size], head)
+        self._summarize_transfer('download', 1, size, start)
+        return buffer
+
+    def _verify_checksum(self, s3_key_id: str, data, head: dict):
+        '''
+        Verify downloaded bytes against the full-object checksum in head, or the ETag when it is a plain MD5.
+        Composite checksums of multipart uploads and ETags of SSE-KMS objects can not be verified and are skipped.
+
+        :param s3_key_id: s3 key id
+        :param data: downloaded bytes
+        :param head: head_object response with ChecksumMode ENABLED
+        :return:
+        '''
+        etag = head['ETag'].strip('"')
+        checksums = {'ChecksumSHA256': lambda d: hashlib.sha256(d).digest(),
+                     'ChecksumSHA1': lambda d: hashlib.sha1(d).digest(),
+                     'ChecksumCRC32': lambda d: zlib.crc32(d).to_bytes(4, 'big')}
+        for field, digest in checksums.items():
+            if field in head and '-' not in head[field]:
+                expected, actual = head[field], base64.b64encode(digest(data)).decode()
+                break
+        else:
+            if '-' in etag or head.get('ServerSideEncryption') == 'aws:kms':
+                self.logger.debug(f'{s3_key_id} has no verifiable checksum.')
+                return
+            expected, actual = etag, hashlib.md5(data).hexdigest()
+        if expected != actual:
+            raise IOError(f'{s3_key_id} checksum mismatch. expected: {expected}, actual: {actual}')
+
     def get_object_as_json(self, s3_key_id: str) -> Optional[dict]:
         '''
         Get S3 object and parse as JSON.
@@ -76,19 +777,68 @@ class S3Manager:
         body = self.get_object(s3_key_id)
         return ujson.loads(body) if body else None
 
-    def put_object_as_json(self, s3_key_id: str, data: dict):
+    def put_object_as_json(self, s3_key_id: str, data: dict, compression: Optional[str] = None):
         '''
         Serialize dict to JSON and put to S3.
 
         :param s3_key_id: s3 key id. ex) nylon-detector/a.json
         :param data: dict data
+        :param compression: gzip or zstd
         :return: response
         '''
-        return self.put_object(s3_key_id, ujson.dumps(data))
+        return self.put_object(s3_key_id, ujson.dumps(data), compression=compression)
+
+    def get_objects_as_json(self, s3_key_ids: list, max_workers: Optional[int] = None) -> list:
+        '''
+        Get many S3 objects concurrently and parse them as JSON.
+
+        :param s3_key_ids: s3 key ids. ex) ['nylon-detector/a.json', 'nylon-detector/b.json']
+        :param max_workers: the number of concurrent requests. default is self.max_workers
+        :return: parsed dicts in input order. None for missing keys and the exception for failed keys.
+        '''
+
+        def get(s3_key_id: str):
+            try:
+                return self.get_object_as_json(s3_key_id)
+            except Exception as e:
+                self.logger.error(f'{s3_key_id} error {e}')
+                return e
+
+        max_workers = max_workers or self.max_workers
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(_bounded_map(executor, get, s3_key_ids, 2 * max_workers))
+
+    def put_objects_as_json(self, data: dict, max_workers: Optional[int] = None) -> dict:
+        '''
+        Serialize many dicts to JSON and put them to S3 concurrently.
+        The bucket's KMS settings are resolved once for the whole batch.
+
+        :param data: dict of s3 key id to data. ex) {'nylon-detector/a.json': {'a': 1}}
+        :param max_workers: the number of concurrent requests. default is self.max_workers
+        :return: dict of s3 key id to response in input order, or the exception for failed keys.
+        '''
+        extra_args = self._get_sse_extra_args() or {}
+
+        def put(item: tuple):
+            s3_key_id, d = item
+            try:
+                response = self.cli.put_object(Bucket=self.bucket_name, Key=s3_key_id, Body=ujson.dumps(d),
+                                               **extra_args)
+                if self.cache:
+                    self.cache.invalidate(self.bucket_name, s3_key_id)
+                return response
+            except Exception as e:
+                self.logger.error(f'{s3_key_id} error {e}')
+                return e
+
+        max_workers = max_workers or self.max_workers
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return dict(zip(data, _bounded_map(executor, put, data.items(), 2 * max_workers)))
 
     def get_object_by_lines(self, s3_key_id: str):
         '''
         get s3 object line by line.
+        gzip or zstd objects are decompressed while they are streamed.
 
         :param s3_key_id: s3 key id. ex) nylon-detector/a.csv
         :return: response
@@ -99,17 +849,108 @@ class S3Manager:
             line_stream = codecs.getreader("utf-8")
             response = self.cli.get_object(Bucket=self.bucket_name,
                                            Key=s3_key_id)
-            return line_stream(response['Body'])
+            compression = _get_content_encoding(s3_key_id, response.get('ContentEncoding'))
+            return line_stream(_decompressing_reader(response['Body'], compression))
         except self.cli.exceptions.NoSuchKey:
             self.logger.info(f'{s3_key_id} does not exist.')
             return None
 
+    def iter_lines_parallel(self, s3_key_id: str, chunk_size: int = 32 * 1024 * 1024, ordered: bool = True,
+                            batches: bool = False, encoding: str = 'utf-8', processes: int = 0,
+                            parse_fn: Optional[Callable] = None, max_workers: Optional[int] = None):
+        '''
+        Read a huge text object line by line with concurrent byte-range GETs.
+        A chunk owns the lines that start inside its range, reading past its end to finish the last one,
+        so every line is yielded exactly once.
+
+        :param s3_key_id: s3 key id. ex) nylon-detector/a.csv
+        :param chunk_size: bytes per chunk
+        :param ordered: yield in object order. otherwise chunks are yielded as soon as they are read.
+        :param batches: yield the lines of each chunk as a list instead of each line.
+        :param encoding: ASCII compatible encoding
+        :param processes: decode chunks in this many processes. 0 decodes in the fetching threads.
+        :param parse_fn: module level function applied to the lines of each chunk. its results are yielded.
+        :param max_workers: the number of concurrent chunks. default is self.max_workers
+        :return: generator of lines, line batches or parse_fn results. None if it does not exist.
+        '''
+        try:
+            head = self.cli.head_object(Bucket=self.bucket_name, Key=s3_key_id)
+        except botocore.exceptions.ClientError as e:
+            if e.response['Error']['Code'] not in ('404', 'NoSuchKey'):
+                raise e
+            self.logger.info(f'{s3_key_id} does not exist.')
+            return None
+        return self._iter_lines_parallel(s3_key_id, head['ETag'], head['ContentLength'], chunk_size, ordered,
+                                         batches or parse_fn is not None, encoding, processes, parse_fn,
+                                         max_workers or self.max_workers)
+
+    def _iter_lines_parallel(self, s3_key_id: str, etag: str, size: int, chunk_size: int, ordered: bool,
+                             batches: bool, encoding: str, processes: int, parse_fn: Optional[Callable],
+                             max_workers: int):
+        '''
+        Generator body of iter_lines_parallel, split out so a missing object returns None eagerly.
+        '''
+        process_executor = ProcessPoolExecutor(max_workers=processes) if processes else None
+
+        def read(start: int):
+            data = self._get_line_chunk(s3_key_id, etag, start, min(start + chunk_size, size), size)
+            if process_executor:
+                return process_executor.submit(_split_line_chunk, data, encoding, parse_fn).result()
+            return _split_line_chunk(data, encoding, parse_fn)
+
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for result in _bounded_map(executor, read, range(0, size, chunk_size), max_workers, ordered=ordered):
+                    if batches:
+                        yield result
+                    else:
+                        yield from result
+        finally:
+            if process_executor:
+                process_executor.shutdown()
+
+    def _get_line_chunk(self, s3_key_id: str, etag: str, start: int, end: int, size: int,
+                        tail_size: int = 64 * 1024) -> bytes:
+        '''
+        Get the complete lines that start in [start, end) of an object.
+
+        :param s3_key_id: s3 key id
+        :param etag: ETag every range is pinned to
+        :param start: chunk start offset
+        :param end: chunk end offset, exclusive
+        :param size: object size
+        :param tail_size: bytes per extra GET to finish the last line
+        :return: bytes of complete lines
+        '''
+        data = self._get_range(s3_key_id, etag, max(start - 1, 0), end - 1)
+        if start:
+            newline = data.find(b'\n')
+            if newline < 0:
+                return b''
+            data = data[newline + 1:]
+            if not data:
+                return b''
+        while end < size and not data.endswith(b'\n'):
+            extra = self._get_range(s3_key_id, etag, end, min(end + tail_size, size) - 1)
+            newline = extra.find(b'\n')
+            if newline >= 0:
+                return data + extra[:newline + 1]
+            data += extra
+            end += len(extra)
+        return data
+
+    def _get_range(self, s3_key_id: str, etag: str, first: int, last: int) -> bytes:
+        return self.cli.get_object(Bucket=self.bucket_name, Key=s3_key_id, Range=f'bytes={first}-{last}',
+                                   IfMatch=etag)['Body'].read()
+
     def delete_object(self, s3_key_id: str):
         '''
 
         :param s3_key_id: s3 key id. ex) nylon-detector/a.csv
         :return: response
         '''
+        if self.cache:
+            self.cache.invalidate(self.bucket_name, s3_key_id)
         return self.cli.delete_object(Bucket=self.bucket_name,
                                       Key=s3_key_id)
 
@@ -121,49 +962,103 @@ class S3Manager:
                                            'Quiet': quiet
                                        })
 
-    def upload_dir(self, local_dir_path: str, s3_dir_path: str):
+    def upload_dir(self, local_dir_path: str, s3_dir_path: str, transfer_config: Optional[TransferConfig] = None):
         '''
-        Upload directory.
+        Upload directory concurrently.
+        All files share one transfer manager, so at most transfer_config.max_concurrency requests run at once.
+
         :param local_dir_path: local dir path. ex) /Users/lks21c/repo/sli-aflow
         :param s3_dir_path: s3 path. ex) nylon-detector/crawl_data
-        :return: response
+        :param transfer_config: part size and concurrency. default is self.transfer_config
+        :return: transfer summary. ex) {'files': 2, 'bytes': 1024, 'seconds': 0.5, 'bytes_per_sec': 2048.0}
         '''
         self.logger.info('Uploading results to s3 initiated...')
         self.logger.info(f'local_path:{local_dir_path}, s3_path:{s3_dir_path}')
+        extra_args = self._get_sse_extra_args()
+        start, total_bytes, futures = time.monotonic(), 0, []
         try:
-            for path, subdirs, files in os.walk(local_dir_path):
-                for file in files:
-                    dest_path = path.replace(local_dir_path, '')
-                    s3_file_path = os.path.normpath(s3_dir_path + '/' + dest_path + '/' + file)
-                    local_file_path = os.path.join(path, file)
-
-                    extra_args = {'ServerSideEncryption': self.kms_algorithm,
-                                  'SSEKMSKeyId': self.kms_id} if self.kms_id else None
-                    self.cli.upload_file(local_file_path, self.bucket_name, s3_file_path, ExtraArgs=extra_args)
-                    self.logger.info(
-                        f'upload : {local_file_path} to Target: s3://{self.bucket_name}/{s3_file_path} Success.')
+            with create_transfer_manager(self.cli, transfer_config or self.transfer_config) as tm:
+                for path, subdirs, files in os.walk(local_dir_path):
+                    for file in files:
+                        dest_path = path.replace(local_dir_path, '')
+                        s3_file_path = os.path.normpath(s3_dir_path + '/' + dest_path + '/' + file)
+                        local_file_path = os.path.join(path, file)
+                        total_bytes += os.path.getsize(local_file_path)
+                        futures.append(tm.upload(local_file_path, self.bucket_name, s3_file_path, extra_args=extra_args))
+                for future in futures:
+                    future.result()
+                    self.logger.debug(f'upload : {future.meta.call_args.fileobj} to Target: '
+                                      f's3://{self.bucket_name}/{future.meta.call_args.key} Success.')
         except Exception as e:
             self.logger.info(e)
             raise e
+        return self._summarize_transfer('upload', len(futures), total_bytes, start)
 
-    def write_and_upload_file(self, content: str, local_file_path: str, s3_file_path: str, do_remove: bool = False):
+    def _get_sse_extra_args(self) -> Optional[dict]:
         '''
-        Upload file.
+        Get server side encryption args of the bucket for upload and copy.
+
+        :return: extra args or None when the bucket has no KMS key.
+        '''
+        return {'ServerSideEncryption': self.kms_algorithm,
+                'SSEKMSKeyId': self.kms_id} if self.kms_id else None
+
+    def _summarize_transfer(self, action: str, files: int, total_bytes: int, start: float) -> dict:
+        '''
+        Log and return throughput of a bulk transfer.
+
+        :param action: upload, download or copy
+        :param files: the number of transferred files
+        :param total_bytes: the number of transferred bytes
+        :param start: time.monotonic() when the transfer started
+        :return: transfer summary
+        '''
+        seconds = time.monotonic() - start
+        bytes_per_sec = total_bytes / seconds if seconds > 0 else 0.0
+        self.logger.info(f'{action} {files} files, {total_bytes} bytes in {seconds:.1f}s '
+                         f'({bytes_per_sec / 1024 / 1024:.2f} MB/s)')
+        return {'files': files, 'bytes': total_bytes, 'seconds': seconds, 'bytes_per_sec': bytes_per_sec}
+
+    def write_and_upload_file(self, content: str, local_file_path: str, s3_file_path: str, do_remove: bool = False,
+                              compression: Optional[str] = None):
+        '''
+        Upload content from memory. The local file is written only when it is kept.
 
         :param content: the content of file. ex) 'col1,col2\nname,height'
         :param local_file_path: local file path. ex) /Users/lks21c/repo/sli-aflow/a.csv
         :param s3_file_path: s3 path. ex) nylon-detector/crawl_data/a.csv
-        :param do_remove: remove written file
+        :param do_remove: do not keep the local file
+        :param compression: gzip or zstd
         :return: response
         '''
 
-        with open(local_file_path, 'w') as f:
-            f.write(content)
-        assert os.path.exists(local_file_path)
-        self.upload_file(local_file_path, s3_file_path)
+        if not do_remove:
+            with open(local_file_path, 'w') as f:
+                f.write(content)
+        self.upload_fileobj(io.BytesIO(content.encode()), s3_file_path, compression=compression)
 
-        if do_remove:
-            os.remove(local_file_path)
+    def upload_fileobj(self, fileobj, s3_file_path: str, compression: Optional[str] = None,
+                       transfer_config: Optional[TransferConfig] = None):
+        '''
+        Upload a readable binary stream with multipart upload.
+        With compression, the stream is compressed while it is uploaded, holding only a few parts in memory.
+
+        :param fileobj: binary stream. ex) open('a.csv', 'rb')
+        :param s3_file_path: s3 path. ex) nylon-detector/crawl_data/a.csv.gz
+        :param compression: gzip or zstd. Content-Encoding is set accordingly.
+        :param transfer_config: part size and concurrency. default is self.transfer_config
+        :return: response
+        '''
+
+        extra_args = dict(self._get_sse_extra_args() or {})
+        if compression:
+            fileobj = io.BufferedReader(_CompressingReader(fileobj, compression))
+            extra_args['ContentEncoding'] = compression
+        self.cli.upload_fileobj(fileobj, self.bucket_name, s3_file_path, ExtraArgs=extra_args,
+                                Config=transfer_config or self.transfer_config)
+        if self.cache:
+            self.cache.invalidate(self.bucket_name, s3_file_path)
+        self.logger.info(f'upload : stream to Target: s3://{self.bucket_name}/{s3_file_path} Success.')
 
     def upload_file(self, local_file_path: str, s3_file_path: str):
         '''
@@ -175,53 +1070,158 @@ class S3Manager:
         '''
 
         try:
-            extra_args = {'ServerSideEncryption': self.kms_algorithm,
-                          'SSEKMSKeyId': self.kms_id} if self.kms_id else None
-            self.cli.upload_file(local_file_path, self.bucket_name, s3_file_path, ExtraArgs=extra_args)
+            extra_args = self._get_sse_extra_args()
+            self.cli.upload_file(local_file_path, self.bucket_name, s3_file_path, ExtraArgs=extra_args,
+                                 Config=self.transfer_config)
             self.logger.info(f'upload : {local_file_path} to Target: s3://{self.bucket_name}/{s3_file_path} Success.')
         except Exception as e:
             self.logger.info(e)
             raise e
 
-    def download_dir(self, s3_dir_path: str, local_dir_path: str = os.getcwd()):
+    def download_dir(self, s3_dir_path: str, local_dir_path: str = os.getcwd(), skip_unchanged: bool = True,
+                     manifest_path: Optional[str] = None, transfer_config: Optional[TransferConfig] = None):
         '''
-        Download directory from s3.
+        Download directory from s3 concurrently.
+        With skip_unchanged, objects whose size, ETag and LastModified match the local manifest are not downloaded.
+        Without a manifest entry, a local file with the same size and mtime as the object is also treated as unchanged.
 
         :param s3_dir_path: s3 path. ex) nylon-detector/crawl_data
         :param local_dir_path: local dir path. ex) /Users/lks21c/repo/sli-aflow
-        :return: response
+        :param skip_unchanged: skip objects that are identical to the local copy
+        :param manifest_path: local manifest file path, outside local_dir_path so it is not synced with the files.
+                              default is a file per bucket, s3_dir_path and local_dir_path in DOWNLOAD_MANIFEST_DIR.
+        :param transfer_config: part size and concurrency. default is self.transfer_config
+        :return: transfer summary with the number of skipped files.
         '''
         self.logger.info('Downloading results to s3 initiated...')
         self.logger.info(f's3_path:{s3_dir_path}, local_path:{local_dir_path}')
-        bucket = boto3.resource('s3').Bucket(self.bucket_name)
-        for obj in bucket.objects.filter(Prefix=s3_dir_path):
-            local_obj_path = os.path.join(local_dir_path, obj.key)
-            if not os.path.exists(os.path.dirname(local_obj_path)):
-                os.makedirs(os.path.dirname(local_obj_path))
-            bucket.download_file(obj.key, local_obj_path)
-            self.logger.info(f'download : {obj.key} to Target: {local_obj_path} Success.')
+        if manifest_path is None:
+            name = hashlib.sha1(f'{self.bucket_name}/{s3_dir_path}:{os.path.abspath(local_dir_path)}'.encode())
+            manifest_path = os.path.join(self.DOWNLOAD_MANIFEST_DIR, f'{name.hexdigest()}.json')
+        manifest = self._load_json_file(manifest_path) if skip_unchanged else {}
+        start, total_bytes, skipped, futures = time.monotonic(), 0, 0, {}
+        try:
+            with create_transfer_manager(self.cli, transfer_config or self.transfer_config) as tm:
+                for obj in self.iter_objects(s3_dir_path):
+                    if obj['Key'].endswith('/'):
+                        continue
+                    local_obj_path = os.path.join(local_dir_path, obj['Key'])
+                    if skip_unchanged and self._is_local_file_unchanged(obj, local_obj_path, manifest.get(obj['Key'])):
+                        skipped += 1
+                        continue
+                    os.makedirs(os.path.dirname(local_obj_path), exist_ok=True)
+                    total_bytes += obj['Size']
+                    futures[tm.download(self.bucket_name, obj['Key'], local_obj_path)] = (obj, local_obj_path)
+                for future, (obj, local_obj_path) in futures.items():
+                    future.result()
+                    mtime = obj['LastModified'].timestamp()
+                    os.utime(local_obj_path, (mtime, mtime))
+                    manifest[obj['Key']] = {'Size': obj['Size'], 'ETag': obj['ETag'], 'LastModified': mtime}
+                    self.logger.debug(f'download : {obj["Key"]} to Target: {local_obj_path} Success.')
+        finally:
+            if skip_unchanged and futures:
+                self._save_json_file(manifest_path, manifest)
+        summary = self._summarize_transfer('download', len(futures), total_bytes, start)
+        summary['skipped'] = skipped
+        return summary
+
+    @staticmethod
+    def _is_local_file_unchanged(obj: dict, local_obj_path: str, entry: Optional[dict]) -> bool:
+        '''
+        Compare a listed s3 object with its local copy.
+
+        :param obj: object of list_objects
+        :param local_obj_path: local file path of the object
+        :param entry: manifest entry of the object written by download_dir
+        :return: True if the local copy is identical.
+        '''
+        if not os.path.isfile(local_obj_path):
+            return False
+        stat = os.stat(local_obj_path)
+        mtime = obj['LastModified'].timestamp()
+        if stat.st_size != obj['Size'] or int(stat.st_mtime) != int(mtime):
+            return False
+        return entry is None or (entry['ETag'] == obj['ETag'] and entry['LastModified'] == mtime)
+
+    @staticmethod
+    def _load_json_file(path: str) -> dict:
+        try:
+            with open(path) as f:
+                return ujson.load(f)
+        except (OSError, ValueError):
+            return {}
 
-    def delete_dir(self, s3_dir_path: str):
+    @staticmethod
+    def _save_json_file(path: str, data: dict):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            ujson.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def delete_dir(self, s3_dir_path: str, depth: int = 0, max_retries: int = 3, max_workers: Optional[int] = None):
         '''
         Delete s3 directory.
+        Listed pages are fed to a pool of delete_objects batches of at most 1000 keys,
+        so listing and deleting overlap.
+        Keys reported in Errors are retried with backoff.
 
         :param s3_dir_path: s3 path. ex) nylon-detector/crawl_data
-        :return:
-        '''
-        files = self.list_objects(s3_dir_path)
-        if not files:
-            return
-        s3_keys = []
-        for k in self.list_objects(s3_dir_path):
-            s3_keys.append(k['Key'])
-            if len(s3_keys) % 1000 == 0:
-                self.logger.info(f'delete 1000 keys.')
-                self.delete_objects(s3_keys)
-                s3_keys = []
-        if len(s3_keys) > 0:
-            self.logger.info(f'delete {len(s3_keys)} keys.')
-            self.delete_objects(s3_keys)
-        self.logger.info(f'delete {s3_dir_path}')
+        :param depth: list shards this many '/' levels below s3_dir_path in parallel. 0 lists serially.
+        :param max_retries: retries for keys that failed to be deleted.
+        :param max_workers: the number of concurrent batches. default is self.max_workers
+        :return: counts. ex) {'deleted': 1000, 'failed': 0}
+        '''
+        max_workers = max_workers or self.max_workers
+        pages = self.iter_objects_parallel(s3_dir_path, depth=depth, pages=True, max_workers=max_workers) if depth \
+            else self.iter_objects(s3_dir_path, pages=True)
+        in_flight = threading.BoundedSemaphore(2 * max_workers)
+        lock = threading.Lock()
+        counts = {'deleted': 0, 'failed': 0}
+
+        def delete(s3_keys: list):
+            try:
+                deleted, failed_keys = self._delete_keys_with_retry(s3_keys, max_retries)
+                with lock:
+                    counts['deleted'] += deleted
+                    counts['failed'] += len(failed_keys)
+            finally:
+                in_flight.release()
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for page in pages:
+                for i in range(0, len(page), 1000):
+                    in_flight.acquire()
+                    executor.submit(delete, [obj['Key'] for obj in page[i:i + 1000]])
+        if counts['deleted'] or counts['failed']:
+            self.logger.info(f'delete {s3_dir_path}: {counts["deleted"]} deleted, {counts["failed"]} failed.')
+        return counts
+
+    def _delete_keys_with_retry(self, s3_keys: list, max_retries: int = 3):
+        '''
+        Delete up to 1000 keys, retrying the keys reported in Errors.
+
+        :param s3_keys: s3 keys
+        :param max_retries: the number of retries
+        :return: (the number of deleted keys, failed keys)
+        '''
+        deleted = 0
+        for attempt in range(max_retries + 1):
+            if attempt:
+                time.sleep(min(0.1 * 2 ** attempt, 5))
+            try:
+                errors = self.delete_objects(s3_keys).get('Errors', [])
+            except Exception as e:
+                self.logger.warning(f'delete {len(s3_keys)} keys error {e}')
+                continue
+            deleted += len(s3_keys) - len(errors)
+            s3_keys = [error['Key'] for error in errors]
+            self.logger.debug(f'delete {deleted} keys.')
+            if not s3_keys:
+                break
+        if s3_keys:
+            self.logger.error(f'failed to delete {len(s3_keys)} keys. ex) {s3_keys[:3]}')
+        return deleted, s3_keys
 
     def download_file(self, s3_file_path: str, local_file_path: str):
         '''
@@ -231,31 +1231,103 @@ class S3Manager:
         :param local_file_path: local file path. ex) /Users/lks21c/repo/sli-aflow/a.csv
         :return: response
         '''
-        bucket = boto3.resource('s3').Bucket(self.bucket_name)
-        bucket.download_file(s3_file_path, local_file_path)
+        if self.cache:
+            shutil.copyfile(self.cache.get_path(self.cli, self.bucket_name, s3_file_path), local_file_path)
+        else:
+            self.cli.download_file(self.bucket_name, s3_file_path, local_file_path, Config=self.transfer_config)
         self.logger.info(f'download : {s3_file_path} to Target: {local_file_path} Success.')
 
-    def list_objects(self, prefix: str = '', delimiter: str = ''):
+    def iter_objects(self, prefix: str = '', delimiter: str = '', pages: bool = False,
+                     start_after: Optional[str] = None, bucket_name: Optional[str] = None):
         '''
-        List S3 objects.
+        Iterate S3 objects lazily, one list_objects_v2 page at a time.
 
         :param prefix: Limits the response to keys that begin with the specified prefix.
         :param delimiter: A delimiter is a character you use to group keys.
-        :return: response
+        :param pages: yield each page as a list of objects instead of each object.
+        :param start_after: start listing after this key.
+        :param bucket_name: bucket name, defaults to instance bucket
+        :return: generator of objects or pages
         '''
-        kwargs = {'Bucket': self.bucket_name, 'Prefix': prefix, 'Delimiter': delimiter}
-        objects = []
+        kwargs = {'Bucket': bucket_name or self.bucket_name, 'Prefix': prefix, 'Delimiter': delimiter}
+        if start_after:
+            kwargs['StartAfter'] = start_after
 
         while True:
             response = self.cli.list_objects_v2(**kwargs)
             if 'Contents' in response:
-                for obj in response['Contents']:
-                    objects.append(obj)
+                if pages:
+                    yield response['Contents']
+                else:
+                    yield from response['Contents']
             if 'NextContinuationToken' in response:
                 kwargs['ContinuationToken'] = response['NextContinuationToken']
             else:
                 break
 
+    def iter_keys(self, prefix: str = '', delimiter: str = '', pages: bool = False,
+                  start_after: Optional[str] = None, bucket_name: Optional[str] = None):
+        '''
+        Iterate S3 object keys lazily.
+
+        :param prefix: Limits the response to keys that begin with the specified prefix.
+        :param delimiter: A delimiter is a character you use to group keys.
+        :param pages: yield each page as a list of keys instead of each key.
+        :param start_after: start listing after this key.
+        :param bucket_name: bucket name, defaults to instance bucket
+        :return: generator of keys or pages of keys
+        '''
+        for page in self.iter_objects(prefix=prefix, delimiter=delimiter, pages=True, start_after=start_after,
+                                      bucket_name=bucket_name):
+            keys = [obj['Key'] for obj in page]
+            if pages:
+                yield keys
+            else:
+                yield from keys
+
+    def iter_objects_parallel(self, prefix: str = '', depth: int = 1, split_keys: Optional[list] = None,
+                              ordered: bool = False, pages: bool = False, max_workers: Optional[int] = None):
+        '''
+        Iterate S3 objects while listing shards of the key space concurrently.
+        By default the shards are the CommonPrefixes found `depth` levels below prefix.
+        Discovery is itself sharded: each level is listed with a delimiter, its objects are yielded page by page
+        and its CommonPrefixes are listed concurrently as they are found.
+        Objects directly under a level are listed serially, so for flat layouts give split_keys instead,
+        and the shards become StartAfter ranges between them.
+        Pages hold at most 1000 objects, and at most 2 * max_workers pages are listed ahead of the consumer
+        across all shards, so memory does not grow with the number of shards.
+
+        :param prefix: Limits the response to keys that begin with the specified prefix.
+        :param depth: how many '/' levels below prefix to discover shards.
+        :param split_keys: sorted keys that split the key space. ex) ['logs/4', 'logs/8', 'logs/c']
+        :param ordered: yield objects in key order. otherwise pages are yielded as soon as any shard returns them.
+        :param pages: yield each page as a list of objects instead of each object.
+        :param max_workers: the number of shards listed at once. default is self.max_workers
+        :return: generator of objects or pages
+        '''
+        max_workers = max_workers or self.max_workers
+        lister = _ShardLister(self.cli, self.bucket_name, max_workers, 2 * max_workers * 1000, ordered)
+        try:
+            bounds = [None] + sorted(split_keys) + [None] if split_keys else [None, None]
+            shards = [lister.add(prefix, bounds[i], bounds[i + 1], 0 if split_keys else depth)
+                      for i in range(len(bounds) - 1)]
+            for page in lister.pages(shards):
+                if pages:
+                    yield page
+                else:
+                    yield from page
+        finally:
+            lister.close()
+
+    def list_objects(self, prefix: str = '', delimiter: str = ''):
+        '''
+        List S3 objects.
+
+        :param prefix: Limits the response to keys that begin with the specified prefix.
+        :param delimiter: A delimiter is a character you use to group keys.
+        :return: response
+        '''
+        objects = list(self.iter_objects(prefix=prefix, delimiter=delimiter))
         return objects if objects else None
 
     def list_object_keys(self, prefix: str = '', delimiter: str = '') -> Optional[list]:
@@ -266,8 +1338,8 @@ class S3Manager:
         :param delimiter: A delimiter is a character you use to group keys.
         :return: list of key strings or None
         '''
-        objects = self.list_objects(prefix=prefix, delimiter=delimiter)
-        return [obj['Key'] for obj in objects] if objects else None
+        keys = list(self.iter_keys(prefix=prefix, delimiter=delimiter))
+        return keys if keys else None
 
     def list_dir(self, prefix: str = '', delimiter: str = '/'):
         '''
@@ -303,36 +1375,43 @@ class S3Manager:
         conf = self.cli.get_bucket_encryption(Bucket=self.bucket_name)['ServerSideEncryptionConfiguration']
         return conf['Rules'][0]['ApplyServerSideEncryptionByDefault'] if conf else None
 
-    def copy(self, from_key: str, to_key: str, to_bucket: Optional[str] = None, **kwargs):
+    def copy(self, from_key: str, to_key: str, to_bucket: Optional[str] = None,
+             transfer_config: Optional[TransferConfig] = None, **kwargs):
         '''
         Creates a copy of an object that is already stored in Amazon S3.
+        Objects above transfer_config.multipart_threshold are copied with concurrent upload_part_copy parts,
+        so there is no 5GB limit. The bucket's KMS settings are kept within the bucket,
+        and a copy to another bucket gets that bucket's default encryption.
 
         :param from_key: origin s3 key
         :param to_key: destination s3 key
         :param to_bucket: destination s3 bucket
-        :return:
+        :param transfer_config: part size and concurrency. default is self.transfer_config
+        :param kwargs: extra args of the destination object. ex) StorageClass='STANDARD_IA'
+        :return: transfer summary
         '''
-
-        copy_source = {
-            'Bucket': self.bucket_name,
-            'Key': from_key
-        }
         to_bucket = to_bucket if to_bucket else self.bucket_name
-        self.cli.copy(copy_source, to_bucket, to_key, ExtraArgs=kwargs)
+        transfer_config = transfer_config or self.transfer_config
+        extra_args = dict(self._get_sse_extra_args() or {}) if to_bucket == self.bucket_name else {}
+        extra_args.update(kwargs)
+        start = time.monotonic()
+        size = self.cli.head_object(Bucket=self.bucket_name, Key=from_key)['ContentLength']
+        with create_transfer_manager(self.cli, transfer_config) as tm:
+            self._submit_copy(tm, from_key, to_key, size, extra_args, to_bucket,
+                              transfer_config=transfer_config).result()
+        if self.cache:
+            self.cache.invalidate(to_bucket, to_key)
+        return self._summarize_transfer('copy', 1, size, start)
 
     def copy_object(self, from_key: str, to_key: str):
         '''
-        Creates a copy of an object that is already stored in Amazon S3.
+        Creates a copy of an object that is already stored in Amazon S3. See copy.
 
         :param from_key: origin s3 key
         :param to_key: destination s3 key
-        :return:
+        :return: transfer summary
         '''
-        self.cli.copy_object(
-            Bucket=self.bucket_name,
-            CopySource=f'{self.bucket_name}/{from_key}',
-            Key=to_key
-        )
+        return self.copy(from_key, to_key)
 
     def get_s3_web_url(self, s3_bucket_name: Optional[str] = None, path: str = '', region: str = 'ap-northeast-2'):
         '''
@@ -401,6 +1480,46 @@ class S3Manager:
         '''
         return self.head_s3_object(self.bucket_name, s3_key_id)
 
+    def head_objects(self, s3_key_ids: list, strategy: str = 'auto', max_workers: Optional[int] = None) -> dict:
+        '''
+        Get the metadata of many objects, with concurrent HEADs or from a listing of their common prefix.
+        A LIST request costs about as much as 12 HEADs, so with auto the common prefix is listed
+        for at most len(s3_key_ids) // 12 pages, and the keys beyond the listed ones are HEADed.
+        A listing gives ContentLength, ETag, LastModified and StorageClass. use head for ContentType and Metadata.
+
+        :param s3_key_ids: s3 key ids. ex) ['nylon-detector/a.csv', 'nylon-detector/b.csv']
+        :param strategy: auto, head or list
+        :param max_workers: the number of concurrent HEADs. default is self.max_workers
+        :return: dict of s3 key id to metadata in input order, None for missing keys.
+        '''
+        results = dict.fromkeys(s3_key_ids)
+        remaining = sorted(results)
+        max_pages = None if strategy == 'list' else 0 if strategy == 'head' else len(remaining) // 12
+        if remaining and max_pages != 0:
+            pages = 0
+            for page in self.iter_objects(os.path.commonprefix(remaining), pages=True,
+                                          start_after=remaining[0][:-1] or None):
+                for obj in page:
+                    if obj['Key'] in results:
+                        results[obj['Key']] = {'ContentLength': obj['Size'], 'ETag': obj['ETag'],
+                                               'LastModified': obj['LastModified'],
+                                               'StorageClass': obj.get('StorageClass', 'STANDARD')}
+                pages += 1
+                remaining = [key for key in remaining if key > page[-1]['Key']]
+                if not remaining or pages == max_pages:
+                    break
+            else:
+                remaining = []
+            self.logger.debug(f'head_objects listed {pages} pages, {len(remaining)} keys left to HEAD.')
+
+        if remaining:
+            max_workers = max_workers or self.max_workers
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for key, head in zip(remaining, _bounded_map(executor, self.get_object_metadata, remaining,
+                                                             2 * max_workers)):
+                    results[key] = head
+        return results
+
     def generate_presigned_url(self, s3_key_id: str, expiration: int = 3600, http_method: str = 'GET') -> str:
         '''
         Generate a presigned URL for an S3 object.
@@ -421,21 +1540,29 @@ class S3Manager:
 
         :return: region string
         '''
-        response = self.cli.get_bucket_location(Bucket=self.bucket_name)
-        return response['LocationConstraint'] or 'us-east-1'
+
+        def load():
+            response = self.cli.get_bucket_location(Bucket=self.bucket_name)
+            return response['LocationConstraint'] or 'us-east-1'
+
+        return self._get_bucket_metadata('location', load)
 
     def check_bucket_exists(self, bucket_name: Optional[str] = None) -> bool:
         '''
         Check if a bucket exists.
 
         :param bucket_name: bucket name, defaults to instance bucket
-        :return: True if exists
+        :return: True if exists. only True is cached, so a newly created bucket is seen at once.
         '''
-        try:
-            self.cli.head_bucket(Bucket=bucket_name or self.bucket_name)
-            return True
-        except botocore.exceptions.ClientError:
-            return False
+
+        def load():
+            try:
+                self.cli.head_bucket(Bucket=bucket_name or self.bucket_name)
+                return True
+            except botocore.exceptions.ClientError:
+                return False
+
+        return self._get_bucket_metadata('exists', load, bucket_name, cache_if=lambda exists: exists)
 
     def rename_file(self, from_file_path: str, to_file_path: str):
         '''
@@ -446,93 +1573,501 @@ class S3Manager:
         :return:
         '''
         self.copy_object(from_key=from_file_path, to_key=to_file_path)
-        self.delete_dir(from_file_path)
+        self.delete_object(from_file_path)
 
-    def count_csv_row_count(self, csv_path: str, distinct_col_name: Optional[str] = None):
-        df = wr.s3.read_csv(path=f's3://{self.bucket_name}/{csv_path}', index_col=False,
-                            keep_default_na=False)
+    def move_prefix(self, from_prefix: str, to_prefix: str, to_bucket: Optional[str] = None,
+                    journal_path: Optional[str] = None, max_retries: int = 3,
+                    transfer_config: Optional[TransferConfig] = None):
+        '''
+        Move every object under from_prefix to to_prefix.
+        Objects are copied concurrently, with multipart copy above transfer_config.multipart_threshold.
+        A source is deleted, in 1000-key batches, only after its copy is verified by a HEAD of the destination.
+        If journal_path is given, the last source key before which every object is moved is saved there,
+        so an interrupted move resumes from it. The journal is removed when the move completes.
+
+        :param from_prefix: origin prefix. ex) nylon-detector/crawl_data/
+        :param to_prefix: destination prefix. ex) nylon-detector/crawl_data_old/
+        :param to_bucket: destination s3 bucket
+        :param journal_path: local journal file path. ex) /tmp/move.json
+        :param max_retries: retries for keys that failed to be deleted.
+        :param transfer_config: part size and concurrency. default is self.transfer_config
+        :return: transfer summary with moved and failed counts.
+        '''
+        to_bucket = to_bucket or self.bucket_name
+        if to_bucket == self.bucket_name and (to_prefix.startswith(from_prefix) or from_prefix.startswith(to_prefix)):
+            raise ValueError(f'{from_prefix} and {to_prefix} overlap.')
+        journal = self._load_json_file(journal_path) if journal_path else {}
+        start_after = journal.get('start_after') \
+            if (journal.get('from_prefix'), journal.get('to_prefix'), journal.get('to_bucket')) \
+            == (from_prefix, to_prefix, to_bucket) else None
+        if start_after:
+            self.logger.info(f'resume after {start_after}')
+        transfer_config = transfer_config or self.transfer_config
+        extra_args = self._get_sse_extra_args() if to_bucket == self.bucket_name else None
+        counts = {'moved': 0, 'failed': 0}
+        start, total_bytes, batch, resumable = time.monotonic(), 0, [], True
+
+        def copy_and_verify(obj: dict):
+            to_key = to_prefix + obj['Key'][len(from_prefix):]
+            try:
+                self._submit_copy(tm, obj['Key'], to_key, obj['Size'], extra_args, to_bucket,
+                                  transfer_config=transfer_config).result()
+                head = self.cli.head_object(Bucket=to_bucket, Key=to_key)
+                if head['ContentLength'] != obj['Size']:
+                    raise IOError(f'{to_key} size mismatch. expected: {obj["Size"]}, actual: {head["ContentLength"]}')
+                return obj, None
+            except Exception as e:
+                return obj, e
+
+        def delete_batch():
+            nonlocal start_after
+            deleted, failed_keys = self._delete_keys_with_retry([obj['Key'] for obj in batch], max_retries)
+            counts['moved'] += deleted
+            counts['failed'] += len(failed_keys)
+            if resumable and not failed_keys:
+                start_after = batch[-1]['Key']
+                if journal_path:
+                    self._save_json_file(journal_path, {'from_prefix': from_prefix, 'to_prefix': to_prefix,
+                                                        'to_bucket': to_bucket, 'start_after': start_after})
+            batch.clear()
+
+        with create_transfer_manager(self.cli, transfer_config) as tm, \
+                ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            objs = self.iter_objects(prefix=from_prefix, start_after=start_after)
+            for obj, error in _bounded_map(executor, copy_and_verify, objs, 2 * self.max_workers):
+                if error:
+                    counts['failed'] += 1
+                    resumable = False
+                    self.logger.error(obj['Key'] + f' error {error}')
+                    continue
+                total_bytes += obj['Size']
+                batch.append(obj)
+                if len(batch) == 1000:
+                    delete_batch()
+            if batch:
+                delete_batch()
+
+        if journal_path and resumable and os.path.exists(journal_path):
+            os.remove(journal_path)
+        summary = self._summarize_transfer('move', counts['moved'], total_bytes, start)
+        summary.update(counts)
+        return summary
+
+    def rename_prefix(self, from_prefix: str, to_prefix: str, journal_path: Optional[str] = None):
+        '''
+        Rename s3 prefix within the bucket. See move_prefix.
+
+        :param from_prefix: origin prefix. ex) nylon-detector/crawl_data/
+        :param to_prefix: destination prefix. ex) nylon-detector/crawl_data_old/
+        :param journal_path: local journal file path. ex) /tmp/rename.json
+        :return: transfer summary with moved and failed counts.
+        '''
+        return self.move_prefix(from_prefix, to_prefix, journal_path=journal_path)
+
+    def sync(self, src_prefix: str, dst_prefix: str, dst_bucket: Optional[str] = None, delete: bool = True,
+             dry_run: bool = False, manifest_path: Optional[str] = None, depth: int = 1,
+             transfer_config: Optional[TransferConfig] = None):
+        '''
+        Make dst_prefix a copy of src_prefix, copying and deleting only the differences.
+        Both sides are listed in parallel and diffed by relative key, size and ETag.
+        A copy's ETag differs from its source when it is KMS encrypted or split into other parts,
+        so like aws s3 sync, an object of the same size is also unchanged when the destination is not older.
+        If manifest_path is given, the (source, destination) ETag pairs of each sync are saved there
+        and such objects are treated as unchanged on the next sync regardless of LastModified.
+
+        :param src_prefix: origin prefix. ex) nylon-detector/crawl_data/
+        :param dst_prefix: destination prefix. ex) nylon-detector/crawl_data_backup/
+        :param dst_bucket: destination s3 bucket
+        :param delete: delete destination objects that are not in the source.
+        :param dry_run: only plan the changes.
+        :param manifest_path: local manifest file path. ex) /tmp/sync.json
+        :param depth: list shards this many '/' levels below each prefix in parallel. 0 lists serially.
+        :param transfer_config: part size and concurrency. default is self.transfer_config
+        :return: the plan if dry_run. ex) {'copy': ['a.csv'], 'delete': ['b.csv'], 'unchanged': 10}
+                 otherwise transfer summary with copied, deleted, failed and unchanged counts.
+        '''
+        dst_bucket = dst_bucket or self.bucket_name
+        if dst_bucket == self.bucket_name and (dst_prefix.startswith(src_prefix) or src_prefix.startswith(dst_prefix)):
+            raise ValueError(f'{src_prefix} and {dst_prefix} overlap.')
+        dst = self if dst_bucket == self.bucket_name else S3Manager(dst_bucket, self.region, self.max_workers)
+        manifest = self._load_json_file(manifest_path) if manifest_path else {}
+        etag_pairs = manifest.get('etags', {}) \
+            if (manifest.get('src_prefix'), manifest.get('dst_prefix'), manifest.get('dst_bucket')) \
+            == (src_prefix, dst_prefix, dst_bucket) else {}
+
+        def list_side(manager, prefix: str) -> dict:
+            objs = manager.iter_objects_parallel(prefix, depth=depth) if depth else manager.iter_objects(prefix)
+            return {obj['Key'][len(prefix):]: obj for obj in objs}
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            src_future = executor.submit(list_side, self, src_prefix)
+            dst_objs = list_side(dst, dst_prefix)
+            src_objs = src_future.result()
+
+        to_copy, unchanged = [], {}
+        for rel, obj in src_objs.items():
+            dst_obj = dst_objs.get(rel)
+            if dst_obj and dst_obj['Size'] == obj['Size'] and \
+                    (dst_obj['ETag'] == obj['ETag'] or etag_pairs.get(rel) == [obj['ETag'], dst_obj['ETag']]
+                     or dst_obj['LastModified'] >= obj['LastModified']):
+                unchanged[rel] = [obj['ETag'], dst_obj['ETag']]
+            else:
+                to_copy.append(rel)
+        to_delete = sorted(rel for rel in dst_objs if rel not in src_objs) if delete else []
+        if dry_run:
+            return {'copy': [dst_prefix + rel for rel in to_copy], 'delete': [dst_prefix + rel for rel in to_delete],
+                    'unchanged': len(unchanged)}
+
+        transfer_config = transfer_config or self.transfer_config
+        extra_args = self._get_sse_extra_args() if dst_bucket == self.bucket_name else None
+        counts = {'copied': 0, 'deleted': 0, 'failed': 0, 'unchanged': len(unchanged)}
+        start, total_bytes = time.monotonic(), 0
+
+        def copy(rel: str):
+            obj, to_key = src_objs[rel], dst_prefix + rel
+            try:
+                self._submit_copy(tm, obj['Key'], to_key, obj['Size'], extra_args, dst_bucket,
+                                  transfer_config=transfer_config).result()
+                return rel, self.cli.head_object(Bucket=dst_bucket, Key=to_key)['ETag'], None
+            except Exception as e:
+                return rel, None, e
+
+        with create_transfer_manager(self.cli, transfer_config) as tm, \
+                ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for rel, dst_etag, error in _bounded_map(executor, copy, to_copy, 2 * self.max_workers, ordered=False):
+                if error:
+                    counts['failed'] += 1
+                    self.logger.error(src_prefix + rel + f' error {error}')
+                    continue
+                counts['copied'] += 1
+                total_bytes += src_objs[rel]['Size']
+                unchanged[rel] = [src_objs[rel]['ETag'], dst_etag]
+            batches = [[dst_prefix + rel for rel in to_delete[i:i + 1000]] for i in range(0, len(to_delete), 1000)]
+            for deleted, failed_keys in executor.map(dst._delete_keys_with_retry, batches):
+                counts['deleted'] += deleted
+                counts['failed'] += len(failed_keys)
+
+        if manifest_path:
+            self._save_json_file(manifest_path, {'src_prefix': src_prefix, 'dst_prefix': dst_prefix,
+                                                 'dst_bucket': dst_bucket, 'etags': unchanged})
+        summary = self._summarize_transfer('sync', counts['copied'], total_bytes, start)
+        summary.update(counts)
+        return summary
+
+    def du(self, prefix: str = '', depth: int = 1, max_workers: Optional[int] = None):
+        '''
+        Storage usage under prefix per sub prefix and storage class, like du.
+        Shards of the key space are listed concurrently and pages are aggregated as they arrive.
+
+        :param prefix: s3 prefix. ex) crawl_data/
+        :param depth: aggregate by sub prefixes this many '/' levels below prefix. 0 aggregates prefix as a whole.
+                      objects above depth are counted in their own directory.
+        :param max_workers: the number of shards listed at once. default is self.max_workers
+        :return: DataFrame of prefix, storage_class, objects and bytes sorted by prefix and storage_class.
+        '''
         import pandas as pd
 
-        if distinct_col_name:
-            return len(pd.unique(df[distinct_col_name]))
-        else:
-            return df.shape[0]
+        usage = {}
+        for page in self.iter_objects_parallel(prefix, depth=max(depth, 1), pages=True, max_workers=max_workers):
+            for obj in page:
+                parts = obj['Key'][len(prefix):].split('/')[:-1][:depth]
+                group = (prefix + ''.join(p + '/' for p in parts), obj.get('StorageClass', 'STANDARD'))
+                objects, total = usage.get(group, (0, 0))
+                usage[group] = (objects + 1, total + obj['Size'])
+        df = pd.DataFrame([(p, c, objects, total) for (p, c), (objects, total) in usage.items()],
+                          columns=['prefix', 'storage_class', 'objects', 'bytes'])
+        return df.sort_values(['prefix', 'storage_class'], ignore_index=True)
+
+    def count_csv_row_count(self, csv_path: str, distinct_col_name: Optional[str] = None, parallel: bool = False,
+                            chunksize: int = 100000, max_exact_distinct: int = 1000000):
+        '''
+        Count CSV rows, or distinct values of one column, in bounded memory.
+        By default the CSV is parsed in chunks, which is exact.
+        With parallel, non-blank lines are counted in concurrent byte ranges instead,
+        which is much faster but wrong for quoted values containing newlines.
+        Compressed objects, known by Content-Encoding or extension, are always parsed in chunks.
+        Distinct counts read only that column in chunks and are exact up to max_exact_distinct values,
+        then switch to a HyperLogLog estimate with about 0.8% error.
+
+        :param csv_path: s3 key id of csv with a header. ex) nylon-detector/a.csv
+        :param distinct_col_name: count distinct values of this column instead of rows.
+        :param parallel: count rows with concurrent byte ranges.
+        :param chunksize: rows per parsed chunk
+        :param max_exact_distinct: the max number of distinct values counted exactly
+        :return: row count or distinct count
+        '''
+        head = self.cli.head_object(Bucket=self.bucket_name, Key=csv_path)
+        if not head['ContentLength']:
+            return 0
+        content_encoding = _get_content_encoding(csv_path, head.get('ContentEncoding'))
+        compressed = content_encoding or os.path.splitext(csv_path)[1] in ('.bz2', '.xz', '.zip', '.tar')
+        if not distinct_col_name and parallel and not compressed:
+            return max(self._count_lines_parallel(csv_path, head) - 1, 0)
+
+        import pandas as pd
+
+        chunks = wr.s3.read_csv(path=f's3://{self.bucket_name}/{csv_path}', index_col=False, keep_default_na=False,
+                                usecols=[distinct_col_name] if distinct_col_name else None,
+                                dtype=str if distinct_col_name else None, chunksize=chunksize,
+                                compression=content_encoding or 'infer')
+        if not distinct_col_name:
+            return sum(df.shape[0] for df in chunks)
+
+        values, hll = set(), None
+        for df in chunks:
+            column = df[distinct_col_name]
+            if hll is None:
+                values.update(column.unique())
+                if len(values) > max_exact_distinct:
+                    hll = _HyperLogLog()
+                    hll.add_hashes(pd.util.hash_pandas_object(pd.Series(list(values)), index=False).values)
+                    values = None
+            else:
+                hll.add_hashes(pd.util.hash_pandas_object(column, index=False).values)
+        return hll.count() if hll else len(values)
+
+    def _count_lines_parallel(self, s3_key_id: str, head: dict, chunk_size: int = 32 * 1024 * 1024) -> int:
+        '''
+        Count non-blank lines of an object in concurrent byte ranges.
+        A range owns the newlines inside it and reads two bytes before it to see whether its first line is blank.
+
+        :param s3_key_id: s3 key id
+        :param head: head_object response of the object
+        :param chunk_size: bytes per ranged GET
+        :return: the number of non-blank lines
+        '''
+        size = head['ContentLength']
+        if not size:
+            return 0
+
+        def count(start: int) -> int:
+            first = max(start - 2, 0)
+            body = self.cli.get_object(Bucket=self.bucket_name, Key=s3_key_id,
+                                       Range=f'bytes={first}-{min(start + chunk_size, size) - 1}',
+                                       IfMatch=head['ETag'])['Body']
+            lines, carry, pos = 0, b'', first
+            for chunk in body.iter_chunks(1024 * 1024):
+                data = carry + chunk
+                data_start = pos - len(carry)
+                for m in _NON_BLANK_LINE_END.finditer(data):
+                    newline = data_start + m.end() - 1
+                    if newline >= start and newline >= pos:
+                        lines += 1
+                pos += len(chunk)
+                carry = data[-2:]
+            return lines
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            lines = sum(executor.map(count, range(0, size, chunk_size)))
+        last = self._get_range(s3_key_id, head['ETag'], size - 1, size - 1)
+        return lines if last in (b'\n', b'\r') else lines + 1
 
     def analyze_s3_access_logs(self,
                                bucket_name: str,
                                prefix: str = None,
                                start_date: str = None,
                                end_date: str = None,
-                               timezone=timezone.utc):
+                               timezone=timezone.utc,
+                               processes: int = 0,
+                               as_dataframe: bool = False):
         '''
         Analyze S3 access logs to count read and write operations.
+        Log keys are pruned by the timestamp in their names, fetched concurrently and counted in a hash table.
+
+        :param bucket_name: bucket of the access logs
+        :param prefix: log key prefix. ex) 145885190059/ap-northeast-2/sli-dst-dlprod-public/
+        :param start_date: inclusive start date. ex) 2024-10-01
+        :param end_date: exclusive end date. ex) 2024-10-31
+        :param timezone: timezone of start_date and end_date
+        :param processes: parse logs in this many processes. 0 parses in the fetching threads.
+        :param as_dataframe: return a DataFrame instead of tab separated text.
+        :return: tab separated text or DataFrame sorted by count
+        '''
+
+        stats = Counter()
+        for counter in self._map_access_logs(_count_access_log_lines, bucket_name, prefix, start_date, end_date,
+                                             timezone, processes):
+            stats.update(counter)
+
+        stats = sorted(((ct, tb, res, val) for (ct, tb, res), val in stats.items()), key=lambda x: x[3], reverse=True)
+        if as_dataframe:
+            import pandas as pd
+            return pd.DataFrame(stats, columns=self._ACCESS_LOG_STATS_HEADERS)
+        return self._format_stats_for_excel(stats)
 
-        :param bucket_name:
-        :param prefix:
-        :param start_date:
-        :param end_date:
-        :return:
+    def iter_s3_access_log_batches(self,
+                                   bucket_name: str,
+                                   prefix: str = None,
+                                   start_date: str = None,
+                                   end_date: str = None,
+                                   timezone=timezone.utc,
+                                   processes: int = 0,
+                                   batch_rows: int = 1000000):
+        '''
+        Parse every field of S3 access logs into typed DataFrame batches.
+
+        :param bucket_name: bucket of the access logs
+        :param prefix: log key prefix. ex) 145885190059/ap-northeast-2/sli-dst-dlprod-public/
+        :param start_date: inclusive start date. ex) 2024-10-01
+        :param end_date: exclusive end date. ex) 2024-10-31
+        :param timezone: timezone of start_date and end_date
+        :param processes: parse logs in this many processes. 0 parses in the fetching threads.
+        :param batch_rows: yield a batch when it has at least this many rows.
+        :return: generator of DataFrame with the access log fields and a date column
+        '''
+        batch = {name: [] for name in _ACCESS_LOG_FIELDS}
+        for columns in self._map_access_logs(_parse_access_log_columns, bucket_name, prefix, start_date, end_date,
+                                             timezone, processes):
+            for name in _ACCESS_LOG_FIELDS:
+                batch[name] += columns[name]
+            if len(batch['time']) >= batch_rows:
+                yield _access_log_columns_to_dataframe(batch)
+                batch = {name: [] for name in _ACCESS_LOG_FIELDS}
+        if batch['time']:
+            yield _access_log_columns_to_dataframe(batch)
+
+    def read_s3_access_logs(self,
+                            bucket_name: str,
+                            prefix: str = None,
+                            start_date: str = None,
+                            end_date: str = None,
+                            timezone=timezone.utc,
+                            processes: int = 0):
+        '''
+        Read S3 access logs into one DataFrame with every field parsed.
+
+        :param bucket_name: bucket of the access logs
+        :param prefix: log key prefix
+        :param start_date: inclusive start date. ex) 2024-10-01
+        :param end_date: exclusive end date. ex) 2024-10-31
+        :param timezone: timezone of start_date and end_date
+        :param processes: parse logs in this many processes. 0 parses in the fetching threads.
+        :return: DataFrame
         '''
+        import pandas as pd
 
+        dfs = list(self.iter_s3_access_log_batches(bucket_name, prefix, start_date, end_date, timezone, processes))
+        return pd.concat(dfs, ignore_index=True) if dfs else _access_log_columns_to_dataframe(
+            {name: [] for name in _ACCESS_LOG_FIELDS})
+
+    def write_s3_access_logs_parquet(self,
+                                     bucket_name: str,
+                                     dst_prefix: str,
+                                     prefix: str = None,
+                                     start_date: str = None,
+                                     end_date: str = None,
+                                     timezone=timezone.utc,
+                                     processes: int = 0,
+                                     batch_rows: int = 1000000) -> int:
+        '''
+        Parse S3 access logs and append them as Parquet partitioned by date under dst_prefix of this bucket.
+
+        :param bucket_name: bucket of the access logs
+        :param dst_prefix: destination s3 path. ex) s3_access_logs/sli-dst-dlprod-public
+        :param prefix: log key prefix
+        :param start_date: inclusive start date. ex) 2024-10-01
+        :param end_date: exclusive end date. ex) 2024-10-31
+        :param timezone: timezone of start_date and end_date
+        :param processes: parse logs in this many processes. 0 parses in the fetching threads.
+        :param batch_rows: rows per written batch
+        :return: the number of written rows
+        '''
+        extra_args = self._get_sse_extra_args()
+        rows = 0
+        for df in self.iter_s3_access_log_batches(bucket_name, prefix, start_date, end_date, timezone, processes,
+                                                  batch_rows):
+            wr.s3.to_parquet(df=df,
+                             path=self.get_s3_full_path(path=dst_prefix.rstrip('/') + '/'),
+                             dataset=True,
+                             partition_cols=['date'],
+                             mode='append',
+                             s3_additional_kwargs=extra_args)
+            rows += df.shape[0]
+            self.logger.info(f'write {rows} access log rows to {dst_prefix}')
+        return rows
+
+    def _map_access_logs(self, fn: Callable, bucket_name: str, prefix: Optional[str], start_date: Optional[str],
+                         end_date: Optional[str], timezone=timezone.utc, processes: int = 0):
+        '''
+        Fetch access logs concurrently and apply fn to each of them.
+
+        :param fn: module level function taking the lines of a log, or the whole log as bytes with processes.
+        :param bucket_name: bucket of the access logs
+        :param prefix: log key prefix
+        :param start_date: inclusive start date. ex) 2024-10-01
+        :param end_date: exclusive end date. ex) 2024-10-31
+        :param timezone: timezone of start_date and end_date
+        :param processes: apply fn in this many processes. 0 applies it in the fetching threads.
+        :return: generator of fn results in completion order
+        '''
         if start_date:
             start_date = datetime.strptime(start_date, '%Y-%m-%d').replace(tzinfo=timezone)
         if end_date:
             end_date = datetime.strptime(end_date, '%Y-%m-%d').replace(tzinfo=timezone)
 
-        kwargs = {'Bucket': bucket_name}
-        if prefix:
-            kwargs['Prefix'] = prefix
-
-        stats = []
-        while True:
-            response = self.cli.list_objects_v2(**kwargs)
-
-            if 'Contents' not in response:
-                break
+        process_executor = ProcessPoolExecutor(max_workers=processes) if processes else None
 
-            self.logger.debug(response)
+        def apply(log_file: str):
+            try:
+                body = self.cli.get_object(Bucket=bucket_name, Key=log_file)['Body']
+                if process_executor:
+                    return process_executor.submit(fn, body.read()).result()
+                return fn(body.iter_lines())
+            except Exception as e:
+                self.logger.error(f'Error: {e} {log_file}')
+                return None
 
-            for obj in response['Contents']:
-
-                if start_date and obj['LastModified'] < start_date:
-                    continue
-                if end_date and obj['LastModified'] >= end_date:
-                    continue
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                log_files = self._iter_access_log_keys(bucket_name, prefix or '', start_date, end_date)
+                for result in _bounded_map(executor, apply, log_files, 2 * self.max_workers, ordered=False):
+                    if result is not None:
+                        yield result
+        finally:
+            if process_executor:
+                process_executor.shutdown()
+
+    def _iter_access_log_keys(self, bucket_name: str, prefix: str, start_date: Optional[datetime],
+                              end_date: Optional[datetime]):
+        '''
+        Iterate access log keys in [start_date, end_date).
+        If the keys continue after prefix with their UTC timestamp, in the SimplePrefix
+        (prefix + YYYY-mm-dd-HH-MM-SS-id) or PartitionedPrefix (prefix + YYYY/mm/dd/YYYY-mm-dd-HH-MM-SS-id) layout,
+        they sort by time, so listing starts after start_date and stops at end_date.
+        Otherwise, e.g. for an account or region prefix, every key is listed and filtered by LastModified.
+
+        :param bucket_name: bucket of the access logs
+        :param prefix: log key prefix
+        :param start_date: inclusive start datetime
+        :param end_date: exclusive end datetime
+        :return: generator of keys
+        '''
+        response = self.cli.list_objects_v2(Bucket=bucket_name, Prefix=prefix, MaxKeys=1)
+        if 'Contents' not in response:
+            return
+        rest = response['Contents'][0]['Key'][len(prefix):]
+        partitioned = _ACCESS_LOG_PARTITIONED_KEY.match(rest)
 
-                log_file = obj['Key']
-                try:
-                    log_content = self.cli.get_object(Bucket=bucket_name, Key=log_file)['Body'].read().decode('utf-8')
-                except Exception as e:
-                    self.logger.error(f'Error: {e} {log_file}')
+        if not _ACCESS_LOG_TIMESTAMP_KEY.match(rest[partitioned.end():] if partitioned else rest):
+            for obj in self.iter_objects(prefix, bucket_name=bucket_name):
+                if (start_date and obj['LastModified'] < start_date) or (end_date and obj['LastModified'] >= end_date):
                     continue
+                yield obj['Key']
+            return
 
-                for line in log_content.splitlines():
-                    token = line.split(' ')
-                    cnt_type = 'read' if token[9].replace('"', '') in ('GET', 'HEAD') else 'write'
-                    target_bucket = token[1]
-                    resource = token[10]
-
-                    found = False
-                    for i, (ct, tb, res, val) in enumerate(stats):
-                        if ct == cnt_type and tb == target_bucket and res == resource:
-                            stats[i] = (ct, tb, res, val + 1)
-                            found = True
-                            break
-
-                    if not found:
-                        stats.append((cnt_type, target_bucket, resource, 1))
+        def to_key(dt: datetime) -> str:
+            dt = dt.astimezone(timezone.utc)
+            return prefix + (f'{dt:%Y/%m/%d}/' if partitioned else '') + f'{dt:%Y-%m-%d-%H-%M-%S}'
 
-            if 'NextContinuationToken' in response:
-                kwargs['ContinuationToken'] = response['NextContinuationToken']
-            else:
+        end_key = to_key(end_date) if end_date else None
+        for key in self.iter_keys(prefix, start_after=to_key(start_date) if start_date else None,
+                                  bucket_name=bucket_name):
+            if end_key and key >= end_key:
                 break
-
-        stats.sort(key=lambda x: x[3], reverse=True)
-        return self._format_stats_for_excel(stats)
+            yield key
 
     def _format_stats_for_excel(self, stats):
-        headers = ["Count Type", "Target Bucket", "Resource", "Value"]
-        rows = [headers] + stats
+        rows = [self._ACCESS_LOG_STATS_HEADERS] + stats
         formatted_output = "\n".join(["\t".join(map(str, row)) for row in rows])
         return formatted_output
 
@@ -541,30 +2076,177 @@ class S3Manager:
         :param avro_path:
         :return:
         """
+        return list(self.iter_avro(avro_path))
+
+    def open_object(self, s3_key_id: str, buffer_size: int = 8 * 1024 * 1024):
+        '''
+        Open an S3 object as a seekable binary file backed by ranged GETs.
+
+        :param s3_key_id: s3 key id. ex) nylon-detector/a.avro
+        :param buffer_size: bytes fetched per GET
+        :return: io.BufferedReader
+        '''
+        return io.BufferedReader(_S3RangeReader(self.cli, self.bucket_name, s3_key_id), buffer_size=buffer_size)
+
+    def iter_avro(self, avro_path: str, fields: Optional[list] = None, batch_size: Optional[int] = None,
+                  buffer_size: int = 8 * 1024 * 1024):
+        '''
+        Stream records of an Avro file from S3 in bounded memory, without a temp file.
+
+        :param avro_path: s3 key id. ex) nylon-detector/a.avro
+        :param fields: read only these top-level fields. default reads all fields.
+        :param batch_size: yield lists of this many records instead of each record.
+        :param buffer_size: bytes fetched per ranged GET
+        :return: generator of records or record batches
+        '''
         filename = avro_path.split('/')[-1]
         assert filename.split('.')[-1] == 'avro'
 
-        with tempfile.TemporaryDirectory() as tmpdir:
-            local_file_path = f'{tmpdir}/{filename}'
-            self.download_file(s3_file_path=avro_path,
-                               local_file_path=local_file_path)
-            reader = DataFileReader(open(local_file_path, 'rb'), DatumReader())
+        with self.open_object(avro_path, buffer_size) as f, DataFileReader(f, DatumReader()) as reader:
+            if fields:
+                schema = ujson.loads(reader.get_meta('avro.schema'))
+                schema['fields'] = [field for field in schema['fields'] if field['name'] in fields]
+                reader.datum_reader.readers_schema = parse_avro_schema(ujson.dumps(schema))
+            if not batch_size:
+                yield from reader
+                return
+            batch = []
+            for record in reader:
+                batch.append(record)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+    def get_avro_as_dataframe(self, avro_path: str, fields: Optional[list] = None,
+                              buffer_size: int = 8 * 1024 * 1024):
+        '''
+        Read an Avro file from S3 into a DataFrame.
+        fastavro is used when it is installed, since it decodes several times faster than avro.
+
+        :param avro_path: s3 key id. ex) nylon-detector/a.avro
+        :param fields: read only these top-level fields. default reads all fields.
+        :param buffer_size: bytes fetched per ranged GET
+        :return: DataFrame
+        '''
+        import pandas as pd
+
+        try:
+            import fastavro
+        except ImportError:
+            return pd.DataFrame.from_records(self.iter_avro(avro_path, fields=fields, buffer_size=buffer_size),
+                                             columns=fields)
 
-        return list(reader)
+        with self.open_object(avro_path, buffer_size) as f:
+            records = fastavro.reader(f)
+            if fields:
+                records = ({k: r[k] for k in fields} for r in records)
+            return pd.DataFrame.from_records(records, columns=fields)
 
-    def change_object_storage_class(self, prefix: str = '', delimiter: str = '', storage_class: str = 'DEEP_ARCHIVE'):
+    def change_object_storage_class(self, prefix: str = '', delimiter: str = '', storage_class: str = 'DEEP_ARCHIVE',
+                                    min_size: int = 0, checkpoint_path: Optional[str] = None,
+                                    transfer_config: Optional[TransferConfig] = None):
         '''
         Change the storage class of all objects in the S3 bucket to DEEP_ARCHIVE.
+        Objects are copied in place concurrently, with multipart copy above transfer_config.multipart_threshold.
+        Objects already in storage_class, archived objects and objects smaller than min_size are skipped.
+        Listing waits once 2 * transfer_config.max_request_concurrency keys are pending behind an unfinished copy.
+        If checkpoint_path is given, the last key before which every object is done is saved there,
+        so an interrupted run resumes from it. The checkpoint stops advancing at the first failed key
+        and is removed only when the run completes without failures.
 
         :param prefix: Limits the response to keys that begin with the specified prefix.
         :param delimiter: A delimiter is a character you use to group keys.
         :param storage_class: STANDARD_IA, ONEZONE_IA, INTELLIGENT_TIERING, GLACIER, DEEP_ARCHIVE
-        '''
-
-        objects = self.list_objects(prefix=prefix, delimiter=delimiter)
-        if objects:
-            for obj in objects:
-                try:
-                    self.copy(from_key=obj['Key'], to_key=obj['Key'], StorageClass=storage_class)
-                except Exception as e:
-                    self.logger.error(obj['Key'] + f' error {e}')
+        :param min_size: skip objects smaller than this size in bytes.
+        :param checkpoint_path: local checkpoint file path. ex) /tmp/transition.json
+        :param transfer_config: part size and concurrency. default is self.transfer_config
+        :return: transfer summary with copied, skipped and failed counts.
+        '''
+        checkpoint = self._load_json_file(checkpoint_path) if checkpoint_path else {}
+        start_after = checkpoint.get('start_after') \
+            if (checkpoint.get('prefix'), checkpoint.get('storage_class')) == (prefix, storage_class) else None
+        if start_after:
+            self.logger.info(f'resume after {start_after}')
+        transfer_config = transfer_config or self.transfer_config
+        extra_args = dict(self._get_sse_extra_args() or {}, StorageClass=storage_class)
+        counts = {'copied': 0, 'skipped': 0, 'failed': 0}
+        start, total_bytes, pending, resumable = time.monotonic(), 0, deque(), True
+        max_pending = 2 * transfer_config.max_request_concurrency
+
+        def save_checkpoint():
+            self._save_json_file(checkpoint_path, {'prefix': prefix, 'storage_class': storage_class,
+                                                   'start_after': start_after})
+
+        def drain(limit: int):
+            nonlocal start_after, resumable
+            while pending and (len(pending) > limit or pending[0][1] is None or pending[0][1].done()):
+                key, future = pending.popleft()
+                if future is not None:
+                    try:
+                        future.result()
+                        counts['copied'] += 1
+                    except Exception as e:
+                        counts['failed'] += 1
+                        resumable = False
+                        self.logger.error(key + f' error {e}')
+                if not resumable:
+                    continue
+                start_after = key
+                if checkpoint_path and (counts['copied'] + counts['skipped']) % 1000 == 0:
+                    save_checkpoint()
+
+        with create_transfer_manager(self.cli, transfer_config) as tm:
+            for obj in self.iter_objects(prefix=prefix, delimiter=delimiter, start_after=start_after):
+                current_class = obj.get('StorageClass', 'STANDARD')
+                if current_class == storage_class or current_class in _ARCHIVED_STORAGE_CLASSES \
+                        or obj['Size'] < min_size:
+                    counts['skipped'] += 1
+                    pending.append((obj['Key'], None))
+                else:
+                    try:
+                        future = self._submit_copy(tm, obj['Key'], obj['Key'], obj['Size'], extra_args,
+                                                   transfer_config=transfer_config)
+                        total_bytes += obj['Size']
+                    except Exception as e:
+                        future = Future()
+                        future.set_exception(e)
+                    pending.append((obj['Key'], future))
+                drain(max_pending)
+            drain(0)
+
+        if checkpoint_path and resumable and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        elif checkpoint_path and not resumable and start_after:
+            save_checkpoint()
+        summary = self._summarize_transfer('copy', counts['copied'], total_bytes, start)
+        summary.update(counts)
+        return summary
+
+    def _submit_copy(self, tm, from_key: str, to_key: str, size: int, extra_args: Optional[dict] = None,
+                     to_bucket: Optional[str] = None, from_bucket: Optional[str] = None,
+                     transfer_config: Optional[TransferConfig] = None):
+        '''
+        Submit a managed server-side copy whose size is already known.
+        Multipart copies do not carry over headers and user metadata, so they are copied from a HEAD of the source.
+
+        :param tm: transfer manager
+        :param from_key: origin s3 key
+        :param to_key: destination s3 key
+        :param size: object size in bytes
+        :param extra_args: extra args of the destination object
+        :param to_bucket: destination s3 bucket
+        :param from_bucket: origin s3 bucket
+        :param transfer_config: transfer config of tm
+        :return: transfer future
+        '''
+        from_bucket = from_bucket or self.bucket_name
+        extra_args = dict(extra_args or {})
+        if size >= (transfer_config or self.transfer_config).multipart_threshold:
+            head = self.cli.head_object(Bucket=from_bucket, Key=from_key)
+            for field in _COPIED_HEAD_FIELDS:
+                if field in head and field not in extra_args:
+                    extra_args[field] = head[field]
+        return tm.copy({'Bucket': from_bucket, 'Key': from_key}, to_bucket or self.bucket_name, to_key,
+                       extra_args=extra_args, subscribers=[_ProvideSizeSubscriber(size)])
@@ -0,0 +1,157 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+import botocore
+
+
+class S3ObjectCache:
+    '''
+    Content-addressed local disk cache of S3 objects with LRU eviction.
+    Blobs are named by the object ETag and entries map bucket/key to the ETag they were last validated against.
+    An entry is revalidated with a conditional GET (IfNoneMatch), unless it was validated within ttl seconds.
+    '''
+
+    def __init__(self, cache_dir: str, max_bytes: int = 1024 * 1024 * 1024, ttl: Optional[float] = None):
+        '''
+
+        :param cache_dir: cache directory. ex) /tmp/baram_cache
+        :param max_bytes: the max total size of cached blobs
+        :param ttl: seconds an entry is trusted without revalidation. None always revalidates.
+        '''
+        self.cache_dir, self.max_bytes, self.ttl = cache_dir, max_bytes, ttl
+        os.makedirs(os.path.join(cache_dir, 'blobs'), exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(os.path.join(cache_dir, 'index.db'), check_same_thread=False)
+        self.db.execute('create table if not exists entries (key text primary key, etag text, blob text, '
+                        'validated real, content_encoding text)')
+        if 'content_encoding' not in [c[1] for c in self.db.execute('pragma table_info(entries)')]:
+            self.db.execute('alter table entries add column content_encoding text')
+        self.db.execute('create table if not exists blobs (blob text primary key, size integer, accessed real)')
+        self.db.commit()
+        self.hits, self.misses, self.revalidations, self.evictions = 0, 0, 0, 0
+
+    def stats(self) -> dict:
+        '''
+        Hit/miss counters and the current size of the cache.
+
+        :return: counters. ex) {'hits': 9, 'misses': 1, 'revalidations': 8, 'evictions': 0, 'bytes': 1024}
+        '''
+        with self.lock:
+            total = self.db.execute('select coalesce(sum(size), 0) from blobs').fetchone()[0]
+        return {'hits': self.hits, 'misses': self.misses, 'revalidations': self.revalidations,
+                'evictions': self.evictions, 'bytes': total}
+
+    def get_object(self, cli, bucket_name: str, s3_key_id: str) -> bytes:
+        '''
+        Get object bytes through the cache.
+
+        :param cli: s3 client
+        :param bucket_name: bucket name
+        :param s3_key_id: s3 key id
+        :return: object bytes
+        '''
+        with open(self.get_path(cli, bucket_name, s3_key_id), 'rb') as f:
+            return f.read()
+
+    def get_path(self, cli, bucket_name: str, s3_key_id: str) -> str:
+        '''
+        Get the local blob path of an object, fetching it on a miss.
+        Raises the client's NoSuchKey when the object does not exist.
+
+        :param cli: s3 client
+        :param bucket_name: bucket name
+        :param s3_key_id: s3 key id
+        :return: blob path. do not modify it.
+        '''
+        key = f'{bucket_name}/{s3_key_id}'
+        with self.lock:
+            entry = self.db.execute('select etag, blob, validated from entries where key = ?', (key,)).fetchone()
+        if entry and os.path.exists(self._blob_path(entry[1])):
+            etag, blob, validated = entry
+            if self.ttl is not None and time.time() - validated < self.ttl:
+                return self._hit(key, blob, revalidated=False)
+            try:
+                response = cli.get_object(Bucket=bucket_name, Key=s3_key_id, IfNoneMatch=etag)
+            except botocore.exceptions.ClientError as e:
+                if e.response['Error']['Code'] not in ('304', 'NotModified'):
+                    raise e
+                return self._hit(key, blob, revalidated=True)
+        else:
+            response = cli.get_object(Bucket=bucket_name, Key=s3_key_id)
+        return self._store(key, response)
+
+    def get_content_encoding(self, bucket_name: str, s3_key_id: str) -> Optional[str]:
+        '''
+        Content-Encoding of a cached object, as it was when the object was fetched.
+
+        :param bucket_name: bucket name
+        :param s3_key_id: s3 key id
+        :return: Content-Encoding or None
+        '''
+        with self.lock:
+            entry = self.db.execute('select content_encoding from entries where key = ?',
+                                    (f'{bucket_name}/{s3_key_id}',)).fetchone()
+        return entry[0] if entry else None
+
+    def invalidate(self, bucket_name: str, s3_key_id: str):
+        '''
+        Forget an entry, so the next read fetches it again.
+
+        :param bucket_name: bucket name
+        :param s3_key_id: s3 key id
+        :return:
+        '''
+        with self.lock:
+            self.db.execute('delete from entries where key = ?', (f'{bucket_name}/{s3_key_id}',))
+            self.db.commit()
+
+    def _blob_path(self, blob: str) -> str:
+        return os.path.join(self.cache_dir, 'blobs', blob)
+
+    def _hit(self, key: str, blob: str, revalidated: bool) -> str:
+        now = time.time()
+        with self.lock:
+            self.hits += 1
+            if revalidated:
+                self.revalidations += 1
+                self.db.execute('update entries set validated = ? where key = ?', (now, key))
+            self.db.execute('update blobs set accessed = ? where blob = ?', (now, blob))
+            self.db.commit()
+        return self._blob_path(blob)
+
+    def _store(self, key: str, response: dict) -> str:
+        blob = hashlib.sha256(response['ETag'].encode()).hexdigest()
+        blob_path = self._blob_path(blob)
+        tmp_path = f'{blob_path}.{threading.get_ident()}.tmp'
+        size = 0
+        with open(tmp_path, 'wb') as f:
+            for chunk in response['Body'].iter_chunks(1024 * 1024):
+                f.write(chunk)
+                size += len(chunk)
+        os.replace(tmp_path, blob_path)
+        now = time.time()
+        with self.lock:
+            self.misses += 1
+            self.db.execute('insert or replace into entries values (?, ?, ?, ?, ?)',
+                            (key, response['ETag'], blob, now, response.get('ContentEncoding')))
+            self.db.execute('insert or replace into blobs values (?, ?, ?)', (blob, size, now))
+            self._evict(keep=blob)
+            self.db.commit()
+        return blob_path
+
+    def _evict(self, keep: str):
+        total = self.db.execute('select coalesce(sum(size), 0) from blobs').fetchone()[0]
+        for blob, size in self.db.execute('select blob, size from blobs where blob != ? order by accessed',
+                                          (keep,)).fetchall():
+            if total <= self.max_bytes:
+                break
+            self.db.execute('delete from blobs where blob = ?', (blob,))
+            self.db.execute('delete from entries where blob = ?', (blob,))
+            if os.path.exists(self._blob_path(blob)):
+                os.remove(self._blob_path(blob))
+            total -= size
+            self.evictions += 1
@@ -1,14 +1,13 @@
 import time
 from typing import Optional
 
-import boto3
-
+from baram.client_manager import ClientManager
 from baram.log_manager import LogManager
 
 
 class SagemakerManager:
     def __init__(self, domain_name: str):
-        self.cli = boto3.client('sagemaker')
+        self.cli = ClientManager.get_client('sagemaker')
         self.domain_id = self.get_domain_id(domain_name=domain_name)
         self.logger = LogManager.get_logger('SagemakerManager')
 
@@ -21,6 +21,7 @@ from sagemaker.workflow.pipeline_context import PipelineSession, LocalPipelineSe
 from sagemaker.workflow.step_collections import RegisterModel
 from sagemaker.workflow.steps import ProcessingStep, TrainingStep, TransformStep
 
+from baram.client_manager import ClientManager
 from baram.s3_manager import S3Manager
 
 
@@ -37,7 +38,7 @@ class SagemakerPipelineManager:
         :param pipeline_name:
         '''
 
-        self.cli = boto3.client('sagemaker')
+        self.cli = ClientManager.get_client('sagemaker')
         self.region = boto3.Session().region_name
         print(f'is_local_mode={is_local_mode}')
         self.role = role_arn if role_arn else sagemaker.get_execution_role()
@@ -0,0 +1,53 @@
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+from baram.async_s3_manager import AsyncS3Manager
+
+
+@pytest.fixture()
+def sample():
+    return {'s3_dir': 'async_s3_manager_test', 'content': {'hello': 'world'}}
+
+
+def test_put_get_object_as_json(sample):
+    async def run():
+        async with AsyncS3Manager('sli-dst-dlbeta-public') as sm:
+            # Given
+            keys = [f'{sample["s3_dir"]}/{i}.json' for i in range(10)]
+
+            # When
+            await asyncio.gather(*[sm.put_object_as_json(k, sample['content']) for k in keys])
+            results = await asyncio.gather(*[sm.get_object_as_json(k) for k in keys])
+
+            # Then
+            assert all(r == sample['content'] for r in results)
+            assert sorted(await sm.list_object_keys(sample['s3_dir'])) == sorted(keys)
+            assert await sm.get_object(f'{sample["s3_dir"]}/not_exist.json') is None
+            assert await sm.delete_dir(sample['s3_dir']) == 10
+
+    asyncio.run(run())
+
+
+def test_upload_download_file(sample):
+    async def run():
+        async with AsyncS3Manager('sli-dst-dlbeta-public') as sm:
+            with tempfile.TemporaryDirectory() as tmp:
+                # Given
+                local_path = os.path.join(tmp, 'a.bin')
+                with open(local_path, 'wb') as f:
+                    f.write(os.urandom(11 * 1024 * 1024))
+                s3_path = f'{sample["s3_dir"]}/a.bin'
+
+                # When
+                await sm.upload_file(local_path, s3_path, part_size=5 * 1024 * 1024)
+                await sm.download_file(s3_path, local_path + '.down')
+
+                # Then
+                with open(local_path, 'rb') as f1, open(local_path + '.down', 'rb') as f2:
+                    assert f1.read() == f2.read()
+                await sm.delete_dir(sample['s3_dir'])
+
+    asyncio.run(run())
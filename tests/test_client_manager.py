@@ -0,0 +1,51 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+
+from baram.client_manager import ClientManager
+
+
+def test_get_client_is_shared():
+    # When
+    clients = list(ThreadPoolExecutor(max_workers=8).map(lambda _: ClientManager.get_client('s3', 'ap-northeast-2'),
+                                                         range(16)))
+
+    # Then
+    assert all(c is clients[0] for c in clients)
+    assert clients[0].meta.config.retries['mode'] == 'adaptive'
+    assert clients[0].meta.config.max_pool_connections == 50
+
+
+def test_get_client_by_region_and_pool_size():
+    # When
+    seoul = ClientManager.get_client('s3', 'ap-northeast-2')
+    virginia = ClientManager.get_client('s3', 'us-east-1')
+    larger_pool = ClientManager.get_client('s3', 'ap-northeast-2', max_pool_connections=100)
+
+    # Then
+    assert seoul is not virginia
+    assert seoul is not larger_pool
+    assert virginia.meta.region_name == 'us-east-1'
+
+
+def test_clear():
+    # Given
+    client = ClientManager.get_client('kms', 'ap-northeast-2')
+
+    # When
+    ClientManager.clear()
+
+    # Then
+    assert ClientManager.get_client('kms', 'ap-northeast-2') is not client
+
+
+def test_get_client_by_default_session():
+    # Given
+    client = ClientManager.get_client('kms', 'ap-northeast-2')
+
+    # When
+    boto3.setup_default_session()
+
+    # Then
+    assert ClientManager.get_client('kms', 'ap-northeast-2') is not client
+    assert ClientManager.get_client('kms', 'ap-northeast-2') is ClientManager.get_client('kms', 'ap-northeast-2')
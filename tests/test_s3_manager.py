@@ -39,6 +39,97 @@ def test_put_get_delete_object(sm, sample):
     assert sm.get_object(sample['s3_key']) is None
 
 
+def test_get_object_parallel(sm, sample):
+    # Given
+    s3_body = os.urandom(3 * 1024 * 1024 + 1)
+    sm.put_object(sample['s3_key'], s3_body)
+    local_file_path = os.path.join(tempfile.mkdtemp(), 'tmp_file')
+
+    # When
+    buffer = sm.get_object_parallel(sample['s3_key'], part_size=1024 * 1024)
+    mapped = sm.get_object_parallel(sample['s3_key'], local_file_path=local_file_path, part_size=1024 * 1024)
+
+    # Then
+    assert bytes(buffer) == s3_body
+    assert mapped[:] == s3_body
+    mapped.close()
+
+    os.remove(local_file_path)
+    sm.delete_object(sample['s3_key'])
+    assert sm.get_object_parallel(sample['s3_key']) is None
+
+
+def test_enable_cache(sample):
+    # Given
+    sm = S3Manager(sample['s3_bucket_name'])
+    cache_dir = tempfile.mkdtemp()
+    cache = sm.enable_cache(cache_dir)
+    sm.put_object(sample['s3_key'], 'hello world')
+
+    # When
+    first = sm.get_object(sample['s3_key'])
+    second = sm.get_object(sample['s3_key'])
+
+    # Then
+    assert first == second == b'hello world'
+    stats = cache.stats()
+    assert stats['misses'] == 1
+    assert stats['hits'] == 1
+    assert stats['revalidations'] == 1
+
+    sm.delete_object(sample['s3_key'])
+    assert sm.get_object(sample['s3_key']) is None
+    shutil.rmtree(cache_dir)
+
+
+def test_put_get_objects_as_json(sm):
+    # Given
+    data = {f'temp_dir/{i}.json': {'i': i} for i in range(10)}
+
+    # When
+    responses = sm.put_objects_as_json(data)
+    results = sm.get_objects_as_json(list(data) + ['temp_dir/missing.json'])
+
+    # Then
+    assert list(responses) == list(data)
+    assert results == list(data.values()) + [None]
+
+    sm.delete_dir('temp_dir/')
+
+
+def test_put_get_compressed_object(sm):
+    # Given
+    s3_key_id = 'temp_dir/a.json'
+    data = {'text': 'hello world ' * 1000}
+
+    # When
+    sm.put_object_as_json(s3_key_id, data, compression='gzip')
+
+    # Then
+    assert len(sm.get_object(s3_key_id, decompress=False)) < len(str(data))
+    assert sm.get_object_as_json(s3_key_id) == data
+    assert ''.join(sm.get_object_by_lines(s3_key_id)) == sm.get_object(s3_key_id).decode()
+
+    sm.delete_object(s3_key_id)
+
+
+def test_batch_writer(sm):
+    # Given
+    s3_dir = 'temp_dir'
+    records = [{'i': i, 'text': 'hello world'} for i in range(1000)]
+
+    # When
+    with sm.batch_writer(s3_dir, compression='gzip', max_records=300) as writer:
+        writer.write_many(records)
+
+    # Then
+    assert len(writer.keys) == 4
+    assert all(k.endswith('.ndjson.gz') for k in writer.keys)
+    assert sum(len(sm.get_object(k).splitlines()) for k in writer.keys) == len(records)
+
+    sm.delete_dir(s3_dir)
+
+
 def test_get_object_by_lines(sm, sample):
     # Given
     s3_body = 'hello world'
@@ -54,6 +145,25 @@ def test_get_object_by_lines(sm, sample):
     assert sm.get_object_by_lines(sample['s3_key']) is None
 
 
+def test_iter_lines_parallel(sm, sample):
+    # Given
+    lines = [f'line {i}' for i in range(1000)]
+    sm.put_object(sample['s3_key'], '\n'.join(lines))
+
+    # When
+    ordered = list(sm.iter_lines_parallel(sample['s3_key'], chunk_size=1000))
+    unordered = list(sm.iter_lines_parallel(sample['s3_key'], chunk_size=1000, ordered=False))
+    batches = list(sm.iter_lines_parallel(sample['s3_key'], chunk_size=1000, batches=True))
+
+    # Then
+    assert ordered == lines
+    assert sorted(unordered) == sorted(lines)
+    assert sum(batches, []) == lines
+
+    sm.delete_object(sample['s3_key'])
+    assert sm.iter_lines_parallel(sample['s3_key']) is None
+
+
 def test_upload_download_delete_dir(sm, sample):
     # Given
     temp_dir = tempfile.mkdtemp()
@@ -78,6 +188,51 @@ def test_upload_download_delete_dir(sm, sample):
     assert len(sm.list_dir(prefix=s3_tmp_dir)) == 0
 
 
+def test_upload_dir_summary(sm):
+    # Given
+    temp_dir = tempfile.mkdtemp()
+    os.makedirs(os.path.join(temp_dir, 'sub'))
+    for i in range(10):
+        with open(os.path.join(temp_dir, 'sub', f'{i}.txt'), 'w') as f:
+            f.write('a' * i)
+    s3_tmp_dir = 'tmp_dir'
+
+    # When
+    summary = sm.upload_dir(temp_dir, s3_tmp_dir)
+
+    # Then
+    assert summary['files'] == 10
+    assert summary['bytes'] == sum(range(10))
+    assert len(sm.list_objects(f'{s3_tmp_dir}/sub/')) == 10
+
+    shutil.rmtree(temp_dir)
+    sm.delete_dir(s3_tmp_dir)
+
+
+def test_download_dir_skip_unchanged(sm):
+    # Given
+    s3_tmp_dir = 'tmp_dir'
+    for i in range(3):
+        sm.put_object(f'{s3_tmp_dir}/{i}.txt', 'hello world')
+    local_dir = tempfile.mkdtemp()
+    manifest_path = os.path.join(tempfile.mkdtemp(), 'manifest.json')
+
+    # When
+    first = sm.download_dir(s3_tmp_dir, local_dir, manifest_path=manifest_path)
+    second = sm.download_dir(s3_tmp_dir, local_dir, manifest_path=manifest_path)
+
+    # Then
+    assert first['files'] == 3
+    assert second['files'] == 0
+    assert second['skipped'] == 3
+    assert os.path.exists(manifest_path)
+    assert sorted(os.listdir(os.path.join(local_dir, s3_tmp_dir))) == ['0.txt', '1.txt', '2.txt']
+
+    shutil.rmtree(local_dir)
+    shutil.rmtree(os.path.dirname(manifest_path))
+    sm.delete_dir(s3_tmp_dir)
+
+
 def test_upload_download_delete_file(sm, sample):
     # Given
     temp_file = tempfile.mkstemp()
@@ -154,6 +309,154 @@ def test_list_dir(sm):
     sm.delete_dir(s3_key_id)
 
 
+def test_iter_objects_and_keys(sm):
+    # Given
+    s3_dir = 'temp_dir/'
+    s3_keys = [f'{s3_dir}{i}.txt' for i in range(3)]
+    for k in s3_keys:
+        sm.put_object(k, 'hello world')
+
+    # When
+    objects = list(sm.iter_objects(prefix=s3_dir))
+    pages = list(sm.iter_keys(prefix=s3_dir, pages=True))
+
+    # Then
+    assert [obj['Key'] for obj in objects] == s3_keys
+    assert pages == [s3_keys]
+    assert list(sm.iter_keys(prefix=s3_dir, start_after=s3_keys[0])) == s3_keys[1:]
+
+    sm.delete_dir(s3_dir)
+
+
+def test_iter_objects_parallel(sm):
+    # Given
+    s3_dir = 'temp_dir/'
+    s3_keys = sorted([f'{s3_dir}{d}/{i}.txt' for d in ('a', 'b', 'c') for i in range(3)] + [f'{s3_dir}top.txt'])
+    for k in s3_keys:
+        sm.put_object(k, 'hello world')
+
+    # When
+    ordered = [obj['Key'] for obj in sm.iter_objects_parallel(prefix=s3_dir, depth=1, ordered=True)]
+    unordered = [obj['Key'] for obj in sm.iter_objects_parallel(prefix=s3_dir, depth=1)]
+    ranged = [obj['Key'] for obj in sm.iter_objects_parallel(prefix=s3_dir,
+                                                             split_keys=[f'{s3_dir}b', f'{s3_dir}c/1.txt'],
+                                                             ordered=True)]
+
+    # Then
+    assert ordered == s3_keys
+    assert sorted(unordered) == s3_keys
+    assert ranged == s3_keys
+
+    sm.delete_dir(s3_dir)
+
+
+def test_iter_objects_parallel_flat_pages(sm):
+    # Given
+    s3_dir = 'temp_dir/'
+    sm.put_objects_as_json({f'{s3_dir}{i:04d}.json': {'i': i} for i in range(1500)})
+
+    # When
+    pages = list(sm.iter_objects_parallel(prefix=s3_dir, depth=1, ordered=True, pages=True))
+
+    # Then
+    assert len(pages) == 2
+    assert max(len(page) for page in pages) <= 1000
+    assert [obj['Key'] for page in pages for obj in page] == sm.list_object_keys(s3_dir)
+
+    sm.delete_dir(s3_dir)
+
+
+def test_delete_dir_counts(sm):
+    # Given
+    s3_dir = 'temp_dir/'
+    for d in ('a', 'b'):
+        for i in range(3):
+            sm.put_object(f'{s3_dir}{d}/{i}.txt', 'hello world')
+
+    # When
+    counts = sm.delete_dir(s3_dir, depth=1)
+
+    # Then
+    assert counts == {'deleted': 6, 'failed': 0}
+    assert sm.list_objects(s3_dir) is None
+
+
+def test_open_listing_index(sm):
+    # Given
+    s3_dir = 'temp_dir/'
+    for d in ('a', 'b'):
+        for i in range(3):
+            sm.put_object(f'{s3_dir}{d}/{i}.txt', 'hello world')
+    index_dir = tempfile.mkdtemp()
+
+    # When
+    index = sm.open_listing_index(os.path.join(index_dir, 'index.db'))
+
+    # Then
+    assert index.list_object_keys(s3_dir) == sm.list_object_keys(s3_dir)
+    assert index.list_dir(s3_dir) == sm.list_dir(s3_dir)
+    assert index.exists(f'{s3_dir}a/0.txt')
+    assert index.get_size(f'{s3_dir}a/') == {'bytes': 33, 'count': 3}
+    assert index.glob(f'{s3_dir}*/1.txt') == [f'{s3_dir}a/1.txt', f'{s3_dir}b/1.txt']
+
+    sm.put_object(f'{s3_dir}c/0.txt', 'hello world')
+    assert index.refresh(s3_dir) == 1
+    assert index.exists(f'{s3_dir}c/0.txt')
+
+    shutil.rmtree(index_dir)
+    sm.delete_dir(s3_dir)
+
+
+def test_du(sm):
+    # Given
+    s3_dir = 'temp_dir/'
+    for d in ('a', 'b'):
+        for i in range(3):
+            sm.put_object(f'{s3_dir}{d}/{i}.txt', 'hello world')
+
+    # When
+    df = sm.du(s3_dir, depth=1)
+
+    # Then
+    assert df['prefix'].tolist() == [f'{s3_dir}a/', f'{s3_dir}b/']
+    assert df['objects'].tolist() == [3, 3]
+    assert df['bytes'].tolist() == [33, 33]
+
+    sm.delete_dir(s3_dir)
+
+
+def test_head_objects(sm):
+    # Given
+    s3_dir = 'temp_dir/'
+    keys = [f'{s3_dir}{i}.txt' for i in range(30)]
+    sm.put_objects_as_json({k: {'i': i} for i, k in enumerate(keys)})
+    missing_key = f'{s3_dir}missing.txt'
+
+    # When
+    listed = sm.head_objects(keys + [missing_key])
+    headed = sm.head_objects(keys + [missing_key], strategy='head')
+
+    # Then
+    assert list(listed) == keys + [missing_key]
+    assert listed[missing_key] is None and headed[missing_key] is None
+    assert all(listed[k]['ETag'] == headed[k]['ETag'] for k in keys)
+
+    sm.delete_dir(s3_dir)
+
+
+def test_delete_dir_flat_over_1000_keys(sm):
+    # Given
+    s3_dir = 'temp_dir/'
+    sm.put_objects_as_json({f'{s3_dir}{i:04d}.json': {'i': i} for i in range(1500)})
+
+    # When
+    counts = sm.delete_dir(s3_dir, depth=1)
+
+    # Then
+    assert counts == {'deleted': 1500, 'failed': 0}
+    assert sm.list_objects(s3_dir) is None
+
+
 def test_get_s3_arn(sm):
     # Given
     bucket_name = 'sli-dst-dlbeta-public'
@@ -174,6 +477,21 @@ def test_get_bucket_encryption(sm, sample):
     print(bi['KMSMasterKeyID'])
 
 
+def test_bucket_metadata_is_shared(sm, sample):
+    # Given
+    S3Manager.clear_bucket_metadata()
+
+    # When
+    other = S3Manager(sample['s3_bucket_name'])
+
+    # Then
+    assert 'encryption' not in [field for _, field in S3Manager._bucket_metadata]
+    assert other.kms_id == sm.kms_id
+    assert other.get_bucket_location() == 'ap-northeast-2'
+    assert other.check_bucket_exists()
+    assert (sample['s3_bucket_name'], 'encryption') in S3Manager._bucket_metadata
+
+
 def test_get_s3_web_url(sm):
     # When
     url = sm.get_s3_web_url('bucket_name', 'a/b')
@@ -228,6 +546,48 @@ def test_rename_file(sm, sample):
     sm.delete_object(to_file_path)
 
 
+def test_move_prefix(sm):
+    # Given
+    from_prefix, to_prefix = 'temp_move_from/', 'temp_move_to/'
+    for i in range(5):
+        sm.put_object(f'{from_prefix}{i}.txt', 'hello world')
+
+    # When
+    summary = sm.move_prefix(from_prefix, to_prefix)
+
+    # Then
+    assert summary['moved'] == 5 and summary['failed'] == 0
+    assert sm.list_objects(from_prefix) is None
+    assert len(sm.list_object_keys(to_prefix)) == 5
+
+    sm.delete_dir(to_prefix)
+
+
+def test_sync(sm):
+    # Given
+    src_prefix, dst_prefix = 'temp_sync_src/', 'temp_sync_dst/'
+    for i in range(5):
+        sm.put_object(f'{src_prefix}{i}.txt', 'hello world')
+    sm.put_object(f'{dst_prefix}extra.txt', 'hello world')
+
+    # When
+    plan = sm.sync(src_prefix, dst_prefix, dry_run=True)
+    summary = sm.sync(src_prefix, dst_prefix)
+    resync = sm.sync(src_prefix, dst_prefix)
+    sm.put_object(f'{src_prefix}0.txt', 'hello world!')
+    changed = sm.sync(src_prefix, dst_prefix)
+
+    # Then
+    assert len(plan['copy']) == 5
+    assert plan['delete'] == [f'{dst_prefix}extra.txt']
+    assert summary['copied'] == 5 and summary['deleted'] == 1
+    assert resync['copied'] == 0 and resync['unchanged'] == 5
+    assert changed['copied'] == 1 and changed['unchanged'] == 4
+
+    sm.delete_dir(src_prefix)
+    sm.delete_dir(dst_prefix)
+
+
 def test_count_csv_row_count(sm):
     # Given
     import csv
@@ -255,6 +615,46 @@ def test_count_csv_row_count(sm):
     sm.delete_object(s3_tmp_file)
 
 
+def test_count_csv_distinct_count(sm):
+    # Given
+    s3_tmp_file = 'tmp_file'
+    rows = ['col1,col2'] + [f'{i % 3},{i}' for i in range(100)]
+    sm.put_object(s3_tmp_file, '\n'.join(rows))
+
+    # When
+    row_cnt = sm.count_csv_row_count(csv_path=s3_tmp_file, parallel=False, chunksize=10)
+    exact_cnt = sm.count_csv_row_count(csv_path=s3_tmp_file, distinct_col_name='col1', chunksize=10)
+    approx_cnt = sm.count_csv_row_count(csv_path=s3_tmp_file, distinct_col_name='col2', chunksize=10,
+                                        max_exact_distinct=10)
+
+    # Then
+    assert row_cnt == 100
+    assert exact_cnt == 3
+    assert abs(approx_cnt - 100) <= 5
+
+    sm.delete_object(s3_tmp_file)
+
+
+def test_count_csv_row_count_edge_cases(sm):
+    # Given
+    rows = 'col1,col2\n' + ''.join(f'{i},{i}\n' for i in range(100))
+    sm.put_object('tmp_file.csv', rows, compression='gzip')
+    sm.put_object('tmp_file_blank.csv', rows + '\n\r\n')
+    sm.put_object('tmp_file_empty.csv', '')
+
+    # When
+    counts = [(sm.count_csv_row_count(csv_path='tmp_file.csv', parallel=parallel),
+               sm.count_csv_row_count(csv_path='tmp_file_blank.csv', parallel=parallel),
+               sm.count_csv_row_count(csv_path='tmp_file_empty.csv', parallel=parallel))
+              for parallel in (False, True)]
+
+    # Then
+    assert counts == [(100, 100, 0), (100, 100, 0)]
+
+    for s3_tmp_file in ('tmp_file.csv', 'tmp_file_blank.csv', 'tmp_file_empty.csv'):
+        sm.delete_object(s3_tmp_file)
+
+
 def test_copy(sm, sample):
     # Given
     s3_body = 'hello world'
@@ -296,6 +696,25 @@ def test_copy_with_storage_class(sm, sample):
     sm.delete_objects([from_key, to_key])
 
 
+def test_copy_multipart(sm, sample):
+    # Given
+    from boto3.s3.transfer import TransferConfig
+
+    from_key, to_key = sample['s3_key'], 'readme_2.md'
+    body = b'a' * (6 * 1024 * 1024)
+    sm.put_object(from_key, body)
+    transfer_config = TransferConfig(multipart_threshold=5 * 1024 * 1024, multipart_chunksize=5 * 1024 * 1024)
+
+    # When
+    summary = sm.copy(from_key=from_key, to_key=to_key, transfer_config=transfer_config)
+
+    # Then
+    assert summary['bytes'] == len(body)
+    assert sm.get_object(to_key) == body
+
+    sm.delete_objects([from_key, to_key])
+
+
 def test_copy_object(sm, sample):
     # Given
     s3_body = 'hello world'
@@ -326,8 +745,112 @@ def test_analyze_s3_access_logs(sm, sample):
     # Then
     print(stats)
 
+
+def test_analyze_s3_access_logs_without_prefix(sm):
+    # When
+    stats = sm.analyze_s3_access_logs(bucket_name='sli-dst-s3access-public',
+                                      start_date='2024-10-01',
+                                      end_date='2024-10-02')
+
+    # Then
+    assert len(stats.splitlines()) > 1
+
+
+def test_analyze_s3_access_logs_with_partial_prefix(sm):
+    # When
+    stats = sm.analyze_s3_access_logs(bucket_name='sli-dst-s3access-public',
+                                      prefix='145885190059/ap-northeast-2/',
+                                      start_date='2024-10-01',
+                                      end_date='2024-10-02')
+
+    # Then
+    assert len(stats.splitlines()) > 1
+
+
+def test_analyze_s3_access_logs_as_dataframe(sm):
+    # When
+    df = sm.analyze_s3_access_logs(bucket_name='sli-dst-s3access-public',
+                                   prefix='145885190059/ap-northeast-2/sli-dst-dlprod-public/',
+                                   start_date='2024-10-01',
+                                   end_date='2024-10-02',
+                                   as_dataframe=True)
+
+    # Then
+    assert list(df.columns) == ['Count Type', 'Target Bucket', 'Resource', 'Value']
+    assert df['Value'].is_monotonic_decreasing
+    print(df.head())
+
+
+def test_read_s3_access_logs(sm):
+    # When
+    df = sm.read_s3_access_logs(bucket_name='sli-dst-s3access-public',
+                                prefix='145885190059/ap-northeast-2/sli-dst-dlprod-public/',
+                                start_date='2024-10-01',
+                                end_date='2024-10-02')
+
+    # Then
+    assert {'time', 'operation', 'http_status', 'bytes_sent', 'turn_around_time', 'date'} <= set(df.columns)
+    assert str(df['http_status'].dtype) == 'Int64'
+    print(df.groupby('http_status')['turn_around_time'].describe())
+
+
 def test_change_storage_class(sm, sample):
     sm.change_object_storage_class(delimiter='/')
 
     # for obj in sm.list_dir(''):
-    #     print(obj)
\ No newline at end of file
+    #     print(obj)
+
+
+def test_change_storage_class_with_checkpoint(sm):
+    # Given
+    s3_dir = 'temp_dir/'
+    s3_key = f'{s3_dir}temp_file.txt'
+    sm.put_object(s3_key, 'hello world')
+    checkpoint_path = os.path.join(tempfile.mkdtemp(), 'checkpoint.json')
+
+    # When
+    first = sm.change_object_storage_class(prefix=s3_dir, storage_class='STANDARD_IA',
+                                           checkpoint_path=checkpoint_path)
+    second = sm.change_object_storage_class(prefix=s3_dir, storage_class='STANDARD_IA')
+
+    # Then
+    assert first['copied'] == 1
+    assert second['skipped'] == 1
+    assert sm.head_s3_object(path=s3_key)['StorageClass'] == 'STANDARD_IA'
+    assert not os.path.exists(checkpoint_path)
+
+    sm.delete_dir(s3_dir)
+
+
+def test_iter_avro(sm):
+    # Given
+    import io
+    import json
+
+    import avro.schema
+    from avro.datafile import DataFileWriter
+    from avro.io import DatumWriter
+
+    schema = avro.schema.parse(json.dumps({'type': 'record', 'name': 'row',
+                                           'fields': [{'name': 'a', 'type': 'int'}, {'name': 'b', 'type': 'string'}]}))
+    buf = io.BytesIO()
+    writer = DataFileWriter(buf, DatumWriter(), schema)
+    for i in range(10):
+        writer.append({'a': i, 'b': str(i)})
+    writer.flush()
+    s3_key = 'temp_dir/tmp.avro'
+    sm.put_object(s3_key, buf.getvalue())
+    writer.close()
+
+    # When
+    records = sm.get_avro_as_list(s3_key)
+    projected = list(sm.iter_avro(s3_key, fields=['a'], batch_size=4))
+    df = sm.get_avro_as_dataframe(s3_key)
+
+    # Then
+    assert records[3] == {'a': 3, 'b': '3'}
+    assert [len(batch) for batch in projected] == [4, 4, 2]
+    assert projected[0][0] == {'a': 0}
+    assert df.shape == (10, 2)
+
+    sm.delete_object(s3_key)